@@ -0,0 +1,269 @@
+"""
+Chunked archive reader for exported roster saves
+
+- streams PLAY tables of many saves (e.g. */saves* exports) in chunks; each chunk is formatted with the
+  data dict schema (format_data), scored with the POVR calculator and checked with row-level validation
+- results are aggregated into mergeable fixed-size stats (POVR distributions, POVR prediction errors,
+  salary values by position/rating decile, check counts), so memory is bounded by chunk size
+- saves are processed on a process pool and partial stats are merged
+- usage: `python archive_reader.py --saves-dir saves --processes 4`
+- note: checks across rows (duplicate ids/names/jerseys, roster sizes) need whole saves; use validate_play_table
+"""
+
+import os
+import sys
+import argparse
+import yaml
+import numpy as np
+import pandas as pd
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import format_data
+from save_updater import load_calcs
+from save_tools import predict_povr_vec, make_salary_ref, get_column_ranges
+
+
+# data dict and calculator shared by workers (set by pool initializer)
+_shared = {}
+
+
+def find_saves(saves_dir, names=None):
+    '''
+    find saves with PLAY tables in saves directory (optional save names)
+    '''
+
+    names = sorted(os.listdir(saves_dir)) if names is None else names
+    paths = {n: f"{saves_dir}/{n}/{n}_PLAY.csv" for n in names}
+
+    return {n: p for n, p in paths.items() if os.path.exists(p)}
+
+
+def iter_play_chunks(path, ddplay, chunksize=50000):
+    '''
+    lazily read PLAY table in formatted chunks (data dict columns and order)
+    '''
+
+    cols_out = ddplay.sort_values(by='view_id', ascending=True)['column'].str.lower().values
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield format_data(chunk)[cols_out]
+
+
+def iter_saves(saves_dir, ddplay, names=None, chunksize=50000):
+    '''
+    lazily iterate (save name, PLAY chunk) over saves
+    '''
+
+    for name, path in find_saves(saves_dir, names).items():
+        for chunk in iter_play_chunks(path, ddplay, chunksize=chunksize):
+            yield name, chunk
+
+
+class ArchiveStats():
+    '''
+    Mergeable PLAY aggregates with fixed or value-bounded size
+
+    - povr_hist: player counts by position (0-20) and POVR (0-99)
+    - diff_hist: POVR obs-pred counts by position and difference (-99 to 99)
+    - salary: yearly salary/bonus value counts by position/rating decile (exact medians and means)
+    - checks: row-level validation issue counts
+    '''
+
+    def __init__(self):
+
+        self.rows = 0
+        self.povr_hist = np.zeros((21, 100), dtype='int64')
+        self.diff_hist = np.zeros((21, 199), dtype='int64')
+        self.salary = {}
+        self.checks = Counter()
+
+
+    def update(self, play, calc_map, ranges):
+        '''
+        add PLAY chunk to stats
+        '''
+
+        sp = play.loc[play['ppos'].isin(range(0,21))]
+        self.rows += play.shape[0]
+        ppos = sp['ppos'].values.astype('int64')
+
+        # POVR distribution and prediction errors
+        povr = sp['povr'].values
+        has_povr = pd.notnull(povr)
+        np.add.at(self.povr_hist, (ppos[has_povr], np.clip(povr[has_povr], 0, 99).astype('int64')), 1)
+        diff = (sp['povr'] - predict_povr_vec(sp, calc_map)).values
+        has_diff = pd.notnull(diff)
+        np.add.at(self.diff_hist, (ppos[has_diff], diff[has_diff].astype('int64') + 99), 1)
+        self.checks['povr_diff'] += int((np.abs(diff[has_diff]) >= 3).sum())
+
+        # yearly salary/bonus values of rostered players (same groups as get_salary_ref)
+        tm = sp.loc[sp['tgid'].isin(range(1,33))]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sal = pd.DataFrame({'ppos': tm['ppos'].values, 'povr_grp': np.floor(tm['povr'].values/10),
+                                'ptsa_yr': tm['ptsa'].values/tm['pcon'].values,
+                                'psbo_yr': tm['psbo'].values/tm['pcon'].values})
+        for key, cnt in sal.groupby(['ppos','povr_grp']).size().items():
+            self.salary.setdefault(key, {'cnt': 0, 'ptsa_yr': Counter(), 'psbo_yr': Counter()})['cnt'] += int(cnt)
+        for col in ['ptsa_yr','psbo_yr']:
+            for (ppos_, grp, val), cnt in sal.groupby(['ppos','povr_grp',col]).size().items():
+                self.salary[(ppos_, grp)][col][val] += int(cnt)
+
+        # row-level checks
+        fa = play['tgid']==1009
+        rostered = play['tgid'].isin(range(1,33))
+        self.checks['bad_ppos'] += int((~play['ppos'].isin(range(0,21))).sum())
+        self.checks['fa_salary'] += int((fa & (play[['ptsa','pvts','psbo','pvsb','pcon','pvco','pcyl']]>0).any(axis=1)).sum())
+        self.checks['zero_salary'] += int((rostered & (play[['ptsa','pvts','pcon','pvco']]==0).any(axis=1)).sum())
+        for col, n in pd.isnull(play).sum(axis=0).items():
+            if n>0:
+                self.checks[f"missing_{col}"] += int(n)
+        for col, (lo, hi) in ranges.items():
+            if col in play.columns and pd.api.types.is_numeric_dtype(play[col]):
+                n = int(((play[col] < lo) | (play[col] > hi)).sum())
+                if n>0:
+                    self.checks[f"bad_range_{col}"] += n
+
+
+    def merge(self, other):
+        '''
+        add other stats to stats
+        '''
+
+        self.rows += other.rows
+        self.povr_hist += other.povr_hist
+        self.diff_hist += other.diff_hist
+        self.checks.update(other.checks)
+        for key, grp in other.salary.items():
+            grp_ = self.salary.setdefault(key, {'cnt': 0, 'ptsa_yr': Counter(), 'psbo_yr': Counter()})
+            grp_['cnt'] += grp['cnt']
+            grp_['ptsa_yr'].update(grp['ptsa_yr'])
+            grp_['psbo_yr'].update(grp['psbo_yr'])
+
+        return self
+
+
+    def get_povr_dist(self):
+        '''
+        get POVR counts by position and rating (nonzero counts)
+        '''
+
+        ppos, povr = np.nonzero(self.povr_hist)
+
+        return pd.DataFrame({'ppos': ppos, 'povr': povr, 'cnt': self.povr_hist[ppos, povr]})
+
+
+    def get_diff_dist(self):
+        '''
+        get POVR obs-pred counts by position and difference (nonzero counts)
+        '''
+
+        ppos, diff = np.nonzero(self.diff_hist)
+
+        return pd.DataFrame({'ppos': ppos, 'povr_diff': diff - 99, 'cnt': self.diff_hist[ppos, diff]})
+
+
+    def get_salary_ref(self):
+        '''
+        get (salref, salmin) salary reference tables from aggregated salary values
+        '''
+
+        def med(vals):
+            if len(vals)==0:
+                return np.nan
+            v = np.array(sorted(vals.keys()))
+            c = np.cumsum([vals[i] for i in v])
+            n = c[-1]
+            lo, hi = v[np.searchsorted(c, (n-1)//2, side='right')], v[np.searchsorted(c, n//2, side='right')]
+            return (lo + hi)/2
+
+        def mu(vals):
+            n = sum(vals.values())
+            return sum(k*c for k, c in vals.items())/n if n>0 else np.nan
+
+        rows = [[k[0], k[1], g['cnt'], med(g['ptsa_yr']), mu(g['ptsa_yr']), med(g['psbo_yr']), mu(g['psbo_yr'])]
+                for k, g in sorted(self.salary.items())]
+        sal = pd.DataFrame(rows, columns=['ppos','povr_grp','cnt','ptsa_med','ptsa_mu','psbo_med','psbo_mu'])
+        sal['povr_grp'] = sal['povr_grp'].astype('float64')
+
+        return make_salary_ref(sal)
+
+
+def _init_worker(shared):
+    '''
+    store shared data dict and calculator in worker process
+    '''
+
+    _shared.update(shared)
+
+
+def _read_save(name, path, chunksize):
+    '''
+    aggregate stats for one save PLAY table (chunked)
+    '''
+
+    stats = ArchiveStats()
+    ranges = get_column_ranges(_shared['ddplay'])
+    for chunk in iter_play_chunks(path, _shared['ddplay'], chunksize=chunksize):
+        stats.update(chunk, _shared['povr_calc'], ranges)
+    summary = {'save': name, 'rows': stats.rows, 'povr_mean': float((stats.povr_hist.sum(axis=0)*np.arange(100)).sum() / max(1, stats.povr_hist.sum())),
+               'issues': int(sum(stats.checks.values()))}
+
+    return stats, summary
+
+
+def read_archive(saves_dir, ddplay, povr_calc, names=None, chunksize=50000, processes=None):
+    '''
+    aggregate stats over saves in chunks on a process pool; returns merged stats and summary by save
+    '''
+
+    saves = find_saves(saves_dir, names)
+    stats = ArchiveStats()
+    summaries = []
+    shared = {'ddplay': ddplay, 'povr_calc': povr_calc}
+
+    if processes==1:
+        _init_worker(shared)
+        results = (_read_save(n, p, chunksize) for n, p in saves.items())
+        for stats_, summary in results:
+            stats.merge(stats_)
+            summaries.append(summary)
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(shared,)) as pool:
+            futures = [pool.submit(_read_save, n, p, chunksize) for n, p in saves.items()]
+            for future in futures:
+                stats_, summary = future.result()
+                stats.merge(stats_)
+                summaries.append(summary)
+
+    return stats, pd.DataFrame(summaries)
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Aggregate ratings/salary/validation stats over exported saves')
+    parser.add_argument('-c', '--config', default='config.yaml', help='config file (default: config.yaml)')
+    parser.add_argument('--saves-dir', default=None, help='saves directory (default: config saves dir)')
+    parser.add_argument('--names', nargs='*', default=None, help='save names (default: all saves in directory)')
+    parser.add_argument('--chunksize', type=int, default=50000, help='PLAY rows per chunk (default: 50000)')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args(args)
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+
+    dd_path = f"{config['setup']['dir']}/{config['setup']['data_dict']}"
+    ddplay = pd.read_excel(dd_path, sheet_name='PLAY')
+    povr_calc = load_calcs(config)['povr_calc']
+    saves_dir = config['saves']['dir'] if args.saves_dir is None else args.saves_dir
+
+    stats, summary = read_archive(saves_dir, ddplay, povr_calc, names=args.names, chunksize=args.chunksize,
+                                  processes=args.processes)
+
+    print(f"Saves:\n{summary.to_string(index=False)}\n")
+    print(f"Check counts:\n{pd.Series(stats.checks, dtype='int64').sort_index().to_string()}\n")
+    dist = stats.get_povr_dist()
+    print(f"POVR by position:\n{dist.groupby('ppos').apply(lambda x: np.average(x['povr'], weights=x['cnt'])).round(1).to_string()}\n")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,122 @@
+"""
+Batch roster update tools
+"""
+
+import io
+import os
+import time
+import contextlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import merge_config
+from save_updater import Save, load_artifacts
+
+
+# artifacts shared by batch workers (set by pool initializer)
+_shared = {}
+
+
+def get_artifacts_key(config):
+    '''
+    create key identifying shared artifacts used by a config
+    '''
+
+    setup = config['setup']
+    saves = config['saves']
+    return (setup['dir'], setup['data_dict'], setup['povr_calc'], setup['pimp_calc'], saves['dir'], saves['import'])
+
+
+def get_batch_configs(config, overlays):
+    '''
+    merge config overlays into base config and assign unique export names
+    '''
+
+    configs = []
+    for i, overlay in enumerate(overlays):
+        cfg = merge_config(config, overlay)
+        if overlay.get('saves', {}).get('export') is None:
+            cfg['saves'] = dict(cfg['saves'], export=f"{config['saves']['export']}_{i:02d}")
+        configs.append(cfg)
+
+    exports = [cfg['saves']['export'] for cfg in configs]
+    dups = sorted(set(e for e in exports if exports.count(e) > 1))
+    if len(dups)>0:
+        raise Exception(f"Duplicate export names in batch: {', '.join(dups)}")
+
+    return configs
+
+
+def _init_worker(artifacts):
+    '''
+    store shared artifacts in worker process
+    '''
+
+    _shared.update(artifacts)
+
+
+def _run_config(config, stages, export):
+    '''
+    run update pipeline for a single config using shared artifacts
+    '''
+
+    label = config['saves']['export']
+    start = time.perf_counter()
+    log = io.StringIO()
+    out = {'label': label, 'import': config['saves']['import'], 'status': 'ok', 'error': None, 'report': None}
+
+    try:
+        with contextlib.redirect_stdout(log):
+            save = Save(config, artifacts=_shared[get_artifacts_key(config)])
+            save.run_stages(stages)
+            out['report'] = save.validate_play()
+            if export:
+                save.export_tables()
+        out['n_play'] = save.sv_play.shape[0]
+        out['n_dcht'] = save.sv_dcht.shape[0]
+    except Exception as e:
+        out['status'] = 'error'
+        out['error'] = repr(e)
+
+    out['log'] = log.getvalue()
+    out['seconds'] = round(time.perf_counter() - start, 3)
+
+    return out
+
+
+def run_batch(config, overlays, stages=None, processes=None, export=True):
+    '''
+    run update pipeline for each config overlay on a process pool
+
+    - shared artifacts (data dicts, calculators, import saves) are loaded once and passed to workers
+    - returns summary table (one row per overlay) and validation reports by export name
+    '''
+
+    configs = get_batch_configs(config, overlays)
+
+    # load shared artifacts once per distinct setup/import
+    artifacts = {}
+    for cfg in configs:
+        key = get_artifacts_key(cfg)
+        if key not in artifacts:
+            artifacts[key] = load_artifacts(cfg)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(configs)))
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(artifacts,)) as pool:
+        results = list(pool.map(_run_config, configs, [stages]*len(configs), [export]*len(configs)))
+
+    # aggregate validation reports
+    reports = {r['label']: r['report'] for r in results}
+    logs = {r['label']: r['log'] for r in results}
+    rows = []
+    for r in results:
+        row = {k: r.get(k) for k in ['label','import','status','error','seconds','n_play','n_dcht']}
+        if r['report'] is not None:
+            row.update({f"n_{k}": len(v) if hasattr(v, '__len__') else 0 for k, v in r['report'].items()})
+        rows.append(row)
+    summary = pd.DataFrame(rows)
+
+    return summary, reports, logs
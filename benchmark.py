@@ -0,0 +1,208 @@
+"""
+Benchmark suite for Save stages and save tools
+
+- times Save load, every update stage and save_tools functions on synthetic leagues (see synth_league.py)
+- appends results (tagged with git commit) to a JSON lines file for comparison across commits
+- usage: `python benchmark.py --scales 1 10 --leagues 1 4` / `python benchmark.py --compare [BASE HEAD]`
+"""
+
+import io
+import os
+import sys
+import time
+import json
+import argparse
+import subprocess
+import contextlib
+import yaml
+import pandas as pd
+
+from utils import merge_config
+from save_updater import Save
+from save_tools import get_ppos_maps, get_tgid_maps, find_player, predict_povr, predict_povr_vec, predict_pimp, \
+                        update_dcht, get_salary_ref, update_salary, resolve_jersey_dups, validate_play_table, \
+                        get_team_starters, calc_team_ratings
+from synth_league import make_synth_leagues, get_synth_overlay
+
+
+def get_commit():
+    '''
+    get current git commit and dirty flag (None if not a git repo)
+    '''
+
+    try:
+        sha = subprocess.run(['git','rev-parse','--short','HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git','status','--porcelain','--untracked-files=no'], capture_output=True, text=True).stdout.strip() != ''
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def time_call(func, repeat=1):
+    '''
+    get best wall time (seconds) of repeated calls
+    '''
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def get_tool_cases(save):
+    '''
+    get save tools benchmark cases using updated save data
+    '''
+
+    sp = save.sv_play.copy()
+    st = save.sv_team.copy()
+    sd = save.sv_dcht.copy()
+    rostered = sp.loc[sp['tgid'].isin(range(1,33))]
+    name = f"{rostered['pfna'].iloc[0]} {rostered['plna'].iloc[0]}"
+    imp = sp.merge(sd, on=['pgid','ppos','tgid'], how='left')
+    imp.loc[pd.isnull(imp['ddep']), 'ddep'] = 0
+    salref, salmin = get_salary_ref(sp)
+
+    cases = {
+        'get_ppos_maps': lambda: get_ppos_maps(),
+        'get_tgid_maps': lambda: get_tgid_maps(st),
+        'find_player': lambda: find_player(name, sp, st),
+        'predict_povr': lambda: sp.apply(predict_povr, calc_map=save.povr_calc, axis=1),
+        'predict_povr_vec': lambda: predict_povr_vec(sp, save.povr_calc),
+        'predict_pimp': lambda: imp.apply(predict_pimp, calc_map=save.pimp_calc, axis=1),
+        'update_dcht': lambda: update_dcht(sp),
+        'calc_team_ratings': lambda: calc_team_ratings(st, get_team_starters(sp, sd)),
+        'get_salary_ref': lambda: get_salary_ref(sp),
+        'update_salary': lambda: rostered.apply(update_salary, years=3, sal_ref=salref, sal_min=salmin, axis=1),
+        'resolve_jersey_dups': lambda: resolve_jersey_dups(sp),
+        'validate_play_table': lambda: validate_play_table(sp, st, save.dd_play, save.povr_calc)
+    }
+
+    return cases, {'play': sp.shape[0], 'rostered': rostered.shape[0]}
+
+
+def run_benchmark(config, scales=(1,), leagues=(1,), repeat=1, seed=0, regen=False, tools=True):
+    '''
+    benchmark Save load, stages and save tools on synthetic leagues at each scale and league count
+
+    - scale multiplies players per league (additional players are free agents); leagues multiplies
+      rostered players, so load/stage times are summed over leagues
+    - save tools are timed on the first league
+    '''
+
+    sha, dirty = get_commit()
+    results = []
+
+    for scale in scales:
+        for n_lg in leagues:
+            name = f"SYNTH_X{scale:g}".replace('.', 'p')
+            overlays = [get_synth_overlay(config, f"{name}_L{i:02d}") for i in range(n_lg)]
+            if regen or not all(os.path.exists(f"{config['saves']['dir']}/{o['saves']['import']}") for o in overlays):
+                overlays = make_synth_leagues(config, name=name, scale=scale, leagues=n_lg, seed=seed)
+            base = {'commit': sha, 'dirty': dirty, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'scale': scale, 'leagues': n_lg}
+
+            # load and stages (fresh save each repeat; best time by league and stage, summed over leagues)
+            stage_times = {}
+            rows = 0
+            for overlay in overlays:
+                cfg = merge_config(config, overlay)
+                best = {}
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    save = Save(cfg, instrument=True)
+                    load = time.perf_counter() - start
+                    best['load'] = min(best.get('load', load), load)
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        save.run_stages()
+                    for rec in save.stage_log:
+                        key = rec['stage']
+                        best[key] = min(best.get(key, rec['seconds']), rec['seconds'])
+                for key, secs in best.items():
+                    stage_times[key] = stage_times.get(key, 0) + secs
+                rows += save.sv_play.shape[0]
+                if overlay is overlays[0]:
+                    save_first = save
+            for key, secs in stage_times.items():
+                results.append(dict(base, kind='load' if key=='load' else 'stage', name=key, seconds=round(secs, 4), rows=rows))
+
+            # save tools
+            if tools:
+                cases, counts = get_tool_cases(save_first)
+                for key, func in cases.items():
+                    secs = time_call(func, repeat=repeat)
+                    results.append(dict(base, kind='tool', name=key, seconds=round(secs, 4), rows=counts['play']))
+
+            print(f"Benchmarked scale {scale:g}, {n_lg} league(s) ({rows} players)")
+
+    return pd.DataFrame(results)
+
+
+def save_results(results, path):
+    '''
+    append benchmark results to JSON lines file
+    '''
+
+    path_dir = os.path.dirname(path)
+    if path_dir:
+        os.makedirs(path_dir, exist_ok=True)
+    with open(path, 'a') as file:
+        for rec in results.to_dict(orient='records'):
+            file.write(json.dumps(rec) + '\n')
+
+
+def compare_results(path, base=None, head=None):
+    '''
+    compare benchmark times between two commits (default: last two commits in results file)
+    '''
+
+    res = pd.read_json(path, lines=True, dtype={'commit': str})
+    commits = list(dict.fromkeys(res['commit']))
+    if len(commits) < 2 and (base is None or head is None):
+        raise Exception("Need results for at least two commits to compare")
+    base = commits[-2] if base is None else base
+    head = commits[-1] if head is None else head
+
+    res = res.loc[res['commit'].isin([base, head])]
+    res['leagues'] = res['leagues'].fillna(1).astype('int64') if 'leagues' in res.columns else 1
+    out = res.groupby(['scale','leagues','kind','name','commit'])['seconds'].min().unstack('commit')
+    out = out[[base, head]].rename(columns={base: f"base_{base}", head: f"head_{head}"}).reset_index()
+    out['ratio'] = (out[f"head_{head}"] / out[f"base_{base}"]).round(2)
+
+    return out
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Benchmark roster update stages and tools')
+    parser.add_argument('-c', '--config', default='config.yaml', help='config file (default: config.yaml)')
+    parser.add_argument('--scales', nargs='+', type=float, default=[1], help='player count multipliers (default: 1)')
+    parser.add_argument('--leagues', nargs='+', type=int, default=[1], help='league counts (default: 1)')
+    parser.add_argument('--repeat', type=int, default=1, help='repeats per benchmark; best time is kept')
+    parser.add_argument('--seed', type=int, default=0, help='synthetic data seed')
+    parser.add_argument('--regen', action='store_true', help='regenerate synthetic saves')
+    parser.add_argument('--no-tools', dest='tools', action='store_false', help='skip save tools benchmarks')
+    parser.add_argument('--out', default='benchmarks/results.jsonl', help='results file (default: benchmarks/results.jsonl)')
+    parser.add_argument('--compare', nargs='*', default=None, metavar='COMMIT', help='compare results for two commits')
+    args = parser.parse_args(args)
+
+    if args.compare is not None:
+        commits = args.compare + [None]*(2-len(args.compare))
+        print(compare_results(args.out, base=commits[0], head=commits[1]).to_string(index=False))
+        return
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+
+    results = run_benchmark(config, scales=args.scales, leagues=args.leagues, repeat=args.repeat, seed=args.seed,
+                            regen=args.regen, tools=args.tools)
+    save_results(results, args.out)
+    print(results[['scale','leagues','kind','name','seconds']].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
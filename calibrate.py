@@ -0,0 +1,204 @@
+"""
+Ratings calculator calibration
+
+- refits per-position POVR formulas and the PIMP model from loaded PLAY/DCHT tables
+- POVR formulas for all positions are solved in one batched least squares (normal equations)
+- calculators are written as numpy archives (.npz) readable by Save (config->setup->povr_calc/pimp_calc)
+- usage: `python calibrate.py --stages base tx ratings --povr-out povr_ratings_calc.npz`
+"""
+
+import io
+import os
+import sys
+import argparse
+import contextlib
+import yaml
+import numpy as np
+import pandas as pd
+
+from save_updater import Save
+from save_tools import predict_povr_vec, predict_pimp_vec, write_calc
+
+
+# POVR formula inputs (attribute order used by the default calculators)
+povr_xvars = ['pspd','pstr','pawr','pagi','pacc','pcth','pcar','pjmp','pbtk','ptak',
+              'pthp','ptha','ppbk','prbk','pkpr','pkac']
+
+# positions sharing one POVR formula (mirrored line/linebacker/safety spots)
+povr_groups = [[0],[1],[2],[3],[4],[5,9],[6,8],[7],[10,11],[12],[13,15],[14],[16],[17,18],[19],[20]]
+
+
+def solve_batched(X, y):
+    '''
+    solve stacked least squares problems X[g] @ b[g] ~ y[g] (zero-padded rows are ignored)
+    '''
+
+    xtx = np.einsum('gni,gnj->gij', X, X)
+    xty = np.einsum('gni,gn->gi', X, y)
+
+    # pseudo-inverse handles attributes that are constant within a group
+    return np.einsum('gij,gj->gi', np.linalg.pinv(xtx, rcond=1e-10), xty)
+
+
+def fit_povr_calc(play, xvars=None, groups=None, min_coef=0.05, decimals=2):
+    '''
+    fit per-position POVR formulas from PLAY table
+
+    - coef: fitted coefficients (rounded)
+    - coef_imp: refit on attributes with coef at least min_coef (absolute value); others are zero
+    '''
+
+    xvars = povr_xvars if xvars is None else xvars
+    groups = povr_groups if groups is None else groups
+    grp_map = {ppos: g for g, grp in enumerate(groups) for ppos in grp}
+
+    sp = play.loc[play['ppos'].isin(grp_map.keys()) & pd.notnull(play['povr'])]
+    grp = sp['ppos'].map(grp_map).values
+    order = np.argsort(grp, kind='stable')
+    grp = grp[order]
+
+    # stack groups into zero-padded design arrays (groups x rows x terms)
+    n_grp = len(groups)
+    counts = np.bincount(grp, minlength=n_grp)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    row = np.arange(grp.shape[0]) - starts[grp]
+    X = np.zeros((n_grp, max(1, counts.max()), len(xvars)+1))
+    y = np.zeros((n_grp, max(1, counts.max())))
+    X[grp, row, 0] = 1
+    X[grp, row, 1:] = sp[xvars].values[order].astype('float64')
+    y[grp, row] = sp['povr'].values[order].astype('float64')
+
+    coef = solve_batched(X, y).round(decimals) + 0.0
+
+    # refit without small coefficients (zeroed design columns get zero coefficients)
+    keep = np.abs(coef) >= min_coef
+    keep[:,0] = True
+    coef_imp = solve_batched(X * keep[:,None,:], y).round(decimals) * keep + 0.0
+
+    terms = ['Intercept'] + list(xvars)
+    calc_map = {}
+    for g, grp_ in enumerate(groups):
+        if counts[g]==0:
+            continue
+        coef_ = pd.Series(coef[g], index=terms)
+        coef_imp_ = pd.Series(coef_imp[g], index=terms)
+        for ppos in grp_:
+            calc_map[ppos] = {'coef': coef_.copy(), 'coef_imp': coef_imp_.copy()}
+
+    return calc_map
+
+
+def get_pimp_data(play, dcht):
+    '''
+    join PLAY and DCHT depth for PIMP model (players off the depth chart have depth 0)
+    '''
+
+    imp = play.merge(dcht[['pgid','ppos','tgid','ddep']], on=['pgid','ppos','tgid'], how='left')
+    imp.loc[pd.isnull(imp['ddep']), 'ddep'] = 0
+
+    return imp
+
+
+def fit_pimp_calc(play, dcht, ppos=range(0,21), decimals=2):
+    '''
+    fit PIMP model (intercept, POVR, depth and position effects relative to QB) from PLAY/DCHT tables
+    '''
+
+    imp = get_pimp_data(play, dcht)
+    imp = imp.loc[imp['ppos'].isin(ppos) & pd.notnull(imp['pimp'])]
+    ppos = list(ppos)
+
+    X = np.zeros((imp.shape[0], 3 + len(ppos)-1))
+    X[:,0] = 1
+    X[:,1] = imp['povr'].values
+    X[:,2] = imp['ddep'].values
+    pos_idx = imp['ppos'].map({p: i for i, p in enumerate(ppos)}).values
+    mask = pos_idx > 0
+    X[np.where(mask)[0], 2 + pos_idx[mask]] = 1
+
+    coef = np.linalg.lstsq(X, imp['pimp'].values.astype('float64'), rcond=None)[0].round(decimals) + 0.0
+
+    calc_map = {'Intercept': np.float64(coef[0]), 'povr': np.float64(coef[1]), 'ddep': np.float64(coef[2])}
+    calc_map['ppos'] = {p: (0 if i==0 else np.float64(coef[2+i])) for i, p in enumerate(ppos)}
+
+    return calc_map
+
+
+def score_povr_calc(play, calc_map, diff_thresh=3):
+    '''
+    get POVR calculator fit by position (rmse, share of players within validation threshold)
+    '''
+
+    sp = play.loc[play['ppos'].isin(calc_map.keys()), ['ppos','povr']].copy()
+    sp['diff'] = sp['povr'] - predict_povr_vec(play.loc[sp.index], calc_map)
+    out = sp.groupby('ppos')['diff'].agg(
+        n='size',
+        rmse=lambda x: np.sqrt(np.mean(x**2)),
+        within=lambda x: np.mean(x.abs() < diff_thresh)
+    ).reset_index()
+
+    return out.round(3)
+
+
+def score_pimp_calc(play, dcht, calc_map):
+    '''
+    get PIMP calculator fit (rmse, share of exact predictions)
+    '''
+
+    imp = get_pimp_data(play, dcht)
+    imp = imp.loc[imp['ppos'].isin(calc_map['ppos'].keys())]
+    diff = imp['pimp'] - predict_pimp_vec(imp, calc_map)
+
+    return {'n': int(imp.shape[0]), 'rmse': round(float(np.sqrt(np.mean(diff**2))), 3),
+            'exact': round(float(np.mean(diff==0)), 3)}
+
+
+def calibrate(save, min_coef=0.05, decimals=2):
+    '''
+    refit POVR and PIMP calculators from save data; returns calculators and fit comparison vs. current
+    '''
+
+    sp = save.sv_play.copy()
+    sd = save.sv_dcht.copy()
+    povr_calc = fit_povr_calc(sp, min_coef=min_coef, decimals=decimals)
+    pimp_calc = fit_pimp_calc(sp, sd, decimals=decimals)
+
+    povr_fit = score_povr_calc(sp, save.povr_calc).merge(
+        score_povr_calc(sp, povr_calc), on=['ppos','n'], suffixes=['_curr','_new'])
+    pimp_fit = pd.DataFrame([score_pimp_calc(sp, sd, save.pimp_calc), score_pimp_calc(sp, sd, pimp_calc)],
+                            index=['curr','new'])
+
+    return {'povr_calc': povr_calc, 'pimp_calc': pimp_calc, 'povr_fit': povr_fit, 'pimp_fit': pimp_fit}
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Refit POVR/PIMP ratings calculators from save data')
+    parser.add_argument('-c', '--config', default='config.yaml', help='config file (default: config.yaml)')
+    parser.add_argument('-s', '--stages', nargs='*', default=[], help='update stages to run before fitting (default: none)')
+    parser.add_argument('--min-coef', type=float, default=0.05, help='minimum absolute POVR coefficient kept in coef_imp')
+    parser.add_argument('--povr-out', default=None, help='POVR calculator file name in setup dir (.npz)')
+    parser.add_argument('--pimp-out', default=None, help='PIMP calculator file name in setup dir (.npz)')
+    args = parser.parse_args(args)
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+
+    save = Save(config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        save.run_stages(args.stages)
+    out = calibrate(save, min_coef=args.min_coef)
+
+    print(f"POVR fit by position:\n{out['povr_fit'].to_string(index=False)}\n")
+    print(f"PIMP fit:\n{out['pimp_fit']}\n")
+
+    setup_dir = config['setup']['dir']
+    for key, fname in [('povr_calc', args.povr_out), ('pimp_calc', args.pimp_out)]:
+        if fname:
+            path = os.path.join(setup_dir, fname)
+            write_calc(out[key], path)
+            print(f"Saved {key} to: {path}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
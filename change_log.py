@@ -0,0 +1,308 @@
+"""
+Change-data-capture log for Save tables
+
+- every write of a Save stage appends cell-level change records (seq, stage, table, key, subkey,
+  column, old, new) for PLAY, TEAM, DCHT and INJY; key is PGID (TGID for TEAM) and subkey is PPOS for
+  DCHT (-1 otherwise)
+- added/removed rows are recorded as a `_row` record (old/new 0 or 1) plus one record per column,
+  so stage runs can be undone by replaying the inverse changes
+- undone tables get their columns and data types from before the undone run, in table sort order
+- records are kept in columnar batches and can be spilled to disk (pickled chunks) once the in-memory
+  log exceeds spill_rows; queries read spilled chunks one at a time
+- numeric values are compared as float (int/float casts are not changes)
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from utils import sort_table
+
+
+# row keys by table
+change_keys = {
+    'play': ['pgid'],
+    'team': ['tgid'],
+    'dcht': ['pgid','ppos'],
+    'injy': ['pgid']
+}
+
+# table sort orders (restored after undo)
+change_sort = {
+    'play': ['tgid','ppos','pgid'],
+    'team': ['tgid'],
+    'dcht': ['tgid','ppos','ddep'],
+    'injy': ['tgid','pgid']
+}
+
+
+def get_changed_mask(old, new):
+    '''
+    flag changed values (numeric as float; both missing is unchanged)
+    '''
+
+    if pd.api.types.is_numeric_dtype(old) and pd.api.types.is_numeric_dtype(new):
+        a, b = old.astype('float64'), new.astype('float64')
+    else:
+        a, b = old.astype('object'), new.astype('object')
+    na_a, na_b = pd.isnull(a), pd.isnull(b)
+
+    return ~((a == b) | (na_a & na_b))
+
+
+def diff_tables(before, after, keys):
+    '''
+    get cell-level changes between table versions (rows matched on key columns)
+
+    - returns dict of columnar arrays (key, subkey, column, old, new)
+    '''
+
+    b = before.set_index(keys)
+    a = after.set_index(keys)
+    if b.index.has_duplicates or a.index.has_duplicates:
+        raise Exception(f"Duplicate change log keys: {'/'.join([k.upper() for k in keys])}")
+
+    out = {'key': [], 'subkey': [], 'column': [], 'old': [], 'new': []}
+    def add(idx, column, old, new):
+        if len(idx)==0:
+            return
+        if len(keys)==1:
+            out['key'].append(np.asarray(idx, dtype='int64'))
+            out['subkey'].append(np.full(len(idx), -1, dtype='int64'))
+        else:
+            out['key'].append(idx.get_level_values(0).values.astype('int64'))
+            out['subkey'].append(idx.get_level_values(1).values.astype('int64'))
+        out['column'].append(np.full(len(idx), column, dtype='object'))
+        out['old'].append(np.asarray(old, dtype='object'))
+        out['new'].append(np.asarray(new, dtype='object'))
+
+    # modified cells
+    common = b.index.intersection(a.index, sort=False)
+    bc, ac = b.loc[common], a.loc[common]
+    for col in [c for c in a.columns if c in b.columns]:
+        mask = get_changed_mask(bc[col], ac[col]).values
+        if mask.any():
+            add(common[mask], col, bc[col].values[mask], ac[col].values[mask])
+
+    # removed and added rows
+    removed = b.index.difference(a.index, sort=False)
+    added = a.index.difference(b.index, sort=False)
+    add(removed, '_row', np.ones(len(removed)), np.zeros(len(removed)))
+    for col in b.columns:
+        add(removed, col, b.loc[removed, col].values, np.full(len(removed), np.nan))
+    add(added, '_row', np.zeros(len(added)), np.ones(len(added)))
+    for col in a.columns:
+        add(added, col, np.full(len(added), np.nan), a.loc[added, col].values)
+
+    if len(out['key'])==0:
+        return {k: np.array([], dtype='int64' if k in ['key','subkey'] else 'object') for k in out}
+
+    return {k: np.concatenate(v) for k, v in out.items()}
+
+
+class ChangeLog():
+    '''
+    Columnar change record log with disk spill, queries and undo
+    '''
+
+    cols = ['seq','stage','table','key','subkey','column','old','new']
+
+    def __init__(self, spill_dir=None, spill_rows=1000000):
+
+        self.spill_dir = spill_dir
+        self.spill_rows = spill_rows
+        self.batches = []
+        self.rows = 0
+        self.spills = []
+        self.seq = 0
+        self.runs = []
+        self.undone = set()
+        self.dtypes = {}
+
+
+    def __len__(self):
+
+        return self.rows + sum(n for _, n in self.spills)
+
+
+    def record(self, stage, before, after):
+        '''
+        append changes between table versions (dicts of table -> data frame) as one stage run; returns seq
+        '''
+
+        self.seq += 1
+        for table, b in before.items():
+            a = after[table]
+            if a is b:
+                continue
+            self.dtypes[(self.seq, table)] = b.dtypes
+            changes = diff_tables(b, a, change_keys[table])
+            n = len(changes['key'])
+            if n==0:
+                continue
+            changes['seq'] = np.full(n, self.seq, dtype='int64')
+            changes['stage'] = np.full(n, stage, dtype='object')
+            changes['table'] = np.full(n, table, dtype='object')
+            self.batches.append(changes)
+            self.rows += n
+        self.runs.append((self.seq, stage))
+
+        if self.spill_dir is not None and self.rows >= self.spill_rows:
+            self.spill()
+
+        return self.seq
+
+
+    def _to_frame(self, batches):
+        '''
+        create change data frame from columnar batches
+        '''
+
+        if len(batches)==0:
+            return pd.DataFrame({c: pd.Series(dtype='object') for c in self.cols})
+
+        out = pd.DataFrame({c: np.concatenate([b[c] for b in batches]) for c in self.cols})
+        for col in ['stage','table','column']:
+            out[col] = out[col].astype('category')
+
+        return out
+
+
+    def spill(self):
+        '''
+        write in-memory records to disk chunk and clear memory
+        '''
+
+        if self.spill_dir is None:
+            raise Exception("Missing change log spill directory")
+        if self.rows==0:
+            return
+        if not os.path.exists(self.spill_dir):
+            os.makedirs(self.spill_dir)
+
+        path = f"{self.spill_dir}/changes_{len(self.spills):05d}.pkl"
+        self._to_frame(self.batches).to_pickle(path)
+        self.spills.append((path, self.rows))
+        self.batches = []
+        self.rows = 0
+
+
+    def get_changes(self, key=None, stage=None, column=None, table=None, seq=None):
+        '''
+        query change records (filters are values or lists; key is PGID, or TGID for TEAM)
+        '''
+
+        filters = {'key': key, 'stage': stage, 'column': column, 'table': table, 'seq': seq}
+        filters = {k: v if isinstance(v, (list, tuple, set)) else [v] for k, v in filters.items() if v is not None}
+
+        def select(d):
+            mask = np.ones(d.shape[0], dtype='bool')
+            for col, vals in filters.items():
+                mask &= d[col].isin(vals).values
+            return d.loc[mask]
+
+        chunks = [select(pd.read_pickle(path)) for path, _ in self.spills]
+        chunks.append(select(self._to_frame(self.batches)))
+        out = pd.concat(chunks, axis=0, ignore_index=True) if len(chunks)>1 else chunks[0].reset_index(drop=True)
+        for col in ['stage','table','column']:
+            out[col] = out[col].astype('object').astype('category')
+
+        return out
+
+
+    def get_summary(self):
+        '''
+        count changes by stage run, table and column
+        '''
+
+        out = self.get_changes()
+
+        return out.groupby(['seq','stage','table','column'], observed=True).size().rename('cnt').reset_index()
+
+
+    def undo(self, tables, stage=None):
+        '''
+        undo latest stage run (or runs back to latest run of stage) by inverse replay
+
+        - tables is dict of table -> data frame; returns (undone tables, undone seqs)
+        - runs after the selected run are undone too (latest first)
+        '''
+
+        runs = [(s, st) for s, st in self.runs if s not in self.undone and not st.startswith('undo')]
+        if stage is not None:
+            runs_stage = [s for s, st in runs if st==stage]
+            if len(runs_stage)==0:
+                raise Exception(f"No stage run to undo: {stage}")
+            runs = [(s, st) for s, st in runs if s >= runs_stage[-1]]
+        elif len(runs)>0:
+            runs = runs[-1:]
+        if len(runs)==0:
+            raise Exception("No stage run to undo")
+
+        seqs = [s for s, _ in runs]
+        changes = self.get_changes(seq=seqs)
+        out = dict(tables)
+        for seq in sorted(seqs, reverse=True):
+            chg = changes.loc[changes['seq']==seq]
+            for table in chg['table'].unique():
+                out[table] = self._undo_table(out[table], chg.loc[chg['table']==table], table,
+                                              self.dtypes[(seq, table)])
+
+        self.record('undo_' + (runs[0][1] if stage is None else stage), tables, out)
+        self.undone.update(seqs)
+
+        return out, seqs
+
+
+    def _undo_table(self, data, chg, table, dtypes):
+        '''
+        apply inverse changes of one stage run to table (columns/data types before the run; rows in table sort order)
+        '''
+
+        keys = change_keys[table]
+
+        def to_index(d):
+            if len(keys)==1:
+                return pd.Index(d['key'].values.astype('int64'))
+            return pd.MultiIndex.from_arrays([d['key'].values.astype('int64'), d['subkey'].values.astype('int64')])
+
+        out = data.set_index(keys)
+        rows = chg.loc[chg['column']=='_row']
+        added = to_index(rows.loc[rows['new'].astype('float64')==1])
+        removed = rows.loc[rows['old'].astype('float64')==1]
+        row_keys = to_index(rows)
+
+        # restore modified cells
+        cells = chg.loc[(chg['column']!='_row') & ~to_index(chg).isin(row_keys)]
+        for col, grp in cells.groupby('column', observed=True):
+            if col not in out.columns:
+                continue
+            vals = pd.Series(grp['old'].values, index=to_index(grp))
+            if pd.api.types.is_numeric_dtype(out[col]):
+                vals = pd.to_numeric(vals)
+                if pd.api.types.is_integer_dtype(out[col]) and vals.isnull().any():
+                    out[col] = out[col].astype('float64')
+            out.loc[vals.index, col] = vals.astype(out[col].dtype) if vals.notnull().all() else vals
+
+        # drop added rows, restore removed rows
+        out = out.loc[~out.index.isin(added)]
+        if removed.shape[0]>0:
+            old = chg.loc[(chg['column']!='_row') & to_index(chg).isin(to_index(removed))]
+            rest = old.assign(column=old['column'].astype('object')).set_index(['key','subkey','column'])['old']
+            rest = rest.unstack('column')
+            rest.index = to_index(rest.index.to_frame(index=False))
+            rest = rest.reindex(columns=out.columns)
+            for col in rest.columns:
+                if pd.api.types.is_numeric_dtype(out[col]):
+                    rest[col] = pd.to_numeric(rest[col])
+            out = pd.concat([out, rest], axis=0)
+
+        out.index.names = keys
+        out = out.reset_index()[list(dtypes.index)]
+        for col, dtype in dtypes.items():
+            if out[col].dtype != dtype and not (pd.api.types.is_integer_dtype(dtype) and out[col].isnull().any()):
+                out[col] = out[col].astype(dtype)
+        out = sort_table(out, change_sort[table])
+        out.reset_index(inplace=True, drop=True)
+
+        return out
@@ -0,0 +1,226 @@
+"""
+Command-line entry point for roster updates
+
+- run selected update stages with config overrides
+- --profile: print per-stage wall time, memory and row counts (see instrument.py)
+- --watch: keep save loaded and reapply affected stages when files in the updates directory change (incl. added/renamed files)
+"""
+
+import os
+import sys
+import glob
+import time
+import fnmatch
+import argparse
+import tracemalloc
+import yaml
+import pandas as pd
+
+from utils import merge_config
+from save_updater import Save, save_stages, update_stages
+from instrument import export_stage_log
+
+
+# save tables checkpointed before each stage (watch mode)
+save_tables = ['sv_play','sv_team','sv_dcht','sv_injy','team_starters']
+
+# update file name patterns by update key (watch mode; configured file names match too)
+update_patterns = {
+    'miss': 'PLAY_MISS_UPD*',
+    'caps': 'PLAY_CAPS_UPD*',
+    'drop': 'PLAY_DROP_UPD*',
+    'txss': 'PLAY_TXS_UPD*',
+    'rate': 'PLAY_RATE_UPD*',
+    'rules': 'PLAY_RULES_UPD*'
+}
+
+
+def parse_args(args=None):
+    '''
+    parse command line arguments
+    '''
+
+    parser = argparse.ArgumentParser(description='Run Madden NFL 2005 roster save updates')
+    parser.add_argument('-c', '--config', default='config.yaml', help='config file (default: config.yaml)')
+    parser.add_argument('-s', '--stages', nargs='+', choices=list(save_stages.keys()), default=None,
+                        help='stages to run, in pipeline order (default: all)')
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                        help='config override using dotted keys (e.g. saves.export=TEST, updates.rate=null)')
+    parser.add_argument('--validate', action='store_true', help='run PLAY validation checks after stages')
+    parser.add_argument('--no-export', dest='export', action='store_false', help='skip table export')
+    parser.add_argument('--profile', action='store_true', help='print per-stage wall time, peak memory and row counts')
+    parser.add_argument('--log', default=None, metavar='PATH', help='append stage records to JSON lines file')
+    parser.add_argument('--changes', action='store_true',
+                        help='record stage writes in change log (spilled to saves.changes directory, if set)')
+    parser.add_argument('--watch', action='store_true', help='reapply affected stages when update files change')
+    parser.add_argument('--interval', type=float, default=1.0, help='watch polling interval in seconds (default: 1)')
+
+    return parser.parse_args(args)
+
+
+def parse_overrides(overrides):
+    '''
+    convert dotted KEY=VALUE overrides into a config overlay
+    '''
+
+    overlay = {}
+    for item in overrides:
+        if '=' not in item:
+            raise Exception(f"Invalid override (expected KEY=VALUE): {item}")
+        key, value = item.split('=', 1)
+        keys = key.strip().split('.')
+        node = overlay
+        for k in keys[:-1]:
+            node = node.setdefault(k, {})
+        node[keys[-1]] = yaml.safe_load(value)
+
+    return overlay
+
+
+def get_stage_order(stages=None):
+    '''
+    get stages to run in pipeline order
+    '''
+
+    if stages is None:
+        return list(save_stages.keys())
+    return [s for s in save_stages if s in stages]
+
+
+def run_stages(save, stages, checkpoints=None):
+    '''
+    run stages in order and return stage records; optionally store table checkpoints before each stage
+    '''
+
+    n_log = len(save.stage_log)
+    for stage in stages:
+        if checkpoints is not None:
+            checkpoints[stage] = {t: getattr(save, t).copy() for t in save_tables}
+        getattr(save, save_stages[stage])(write=True)
+
+    return save.stage_log[n_log:]
+
+
+def print_profile(records):
+    '''
+    print stage profile table
+    '''
+
+    if len(records)==0:
+        return
+    cols = ['stage','table','seconds','log_seconds','mem_delta_mb','mem_peak_mb','rows_in','rows_out','rows_changed']
+    prof = pd.DataFrame(records)[cols]
+    total = prof['seconds'].sum() + prof['log_seconds'].fillna(0).sum()
+    print(f"Stage profile (total {total:.3f}s):\n{prof.to_string(index=False)}\n")
+
+
+def get_update_mtimes(config):
+    '''
+    get modification times of files in updates directory
+    '''
+
+    mtimes = {}
+    for path in glob.glob(f"{config['updates']['dir']}/*"):
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except OSError:
+            continue
+
+    return mtimes
+
+
+def get_changed_keys(config, before, after):
+    '''
+    get update keys of added, removed, renamed or modified update files
+    '''
+
+    names = [os.path.basename(p) for p in set(before) | set(after) if before.get(p) != after.get(p)]
+    keys = []
+    for key in update_stages:
+        if any(n==config['updates'].get(key) or fnmatch.fnmatch(n, update_patterns[key]) for n in names):
+            keys.append(key)
+
+    return keys
+
+
+def finalize(save, records, args):
+    '''
+    print/log stage records and run post-stage validation and export
+    '''
+
+    if args.profile:
+        print_profile(records)
+    if args.log:
+        export_stage_log(records, args.log, append=True)
+    if args.validate:
+        save.validate_play()
+    if args.export:
+        save.export_tables()
+
+
+def watch(save, stages, checkpoints, args):
+    '''
+    poll updates directory and rerun stages downstream of changed (incl. added/renamed) update files
+    '''
+
+    mtimes = get_update_mtimes(save.config)
+    print(f"Watching {save.config['updates']['dir']} for changes (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(args.interval)
+            curr = get_update_mtimes(save.config)
+            if curr==mtimes:
+                continue
+            changed = get_changed_keys(save.config, mtimes, curr)
+            mtimes = curr
+            if len(changed)==0:
+                continue
+
+            # restart from earliest stage that consumes a changed file
+            first = min((stages.index(update_stages[k]) for k in changed if update_stages[k] in stages), default=None)
+            if first is None:
+                continue
+            rerun = stages[first:]
+            print(f"Changed: {', '.join(changed)} -> rerunning: {', '.join(rerun)}")
+
+            save.restore_tables(checkpoints[rerun[0]])
+            try:
+                save._init_updates(keys=changed)
+                records = run_stages(save, rerun, checkpoints=checkpoints)
+                finalize(save, records, args)
+            except Exception as e:
+                print(f"Update failed: {e!r}")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def main(args=None):
+
+    args = parse_args(args)
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    config = merge_config(config, parse_overrides(args.overrides))
+
+    if args.profile:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    save = Save(config, instrument=args.profile or args.log is not None, track_changes=args.changes)
+    if args.profile:
+        print(f"Loaded save in {time.perf_counter() - start:.3f}s\n")
+
+    stages = get_stage_order(args.stages)
+    checkpoints = {} if args.watch else None
+    records = run_stages(save, stages, checkpoints=checkpoints)
+    finalize(save, records, args)
+
+    if args.watch:
+        watch(save, stages, checkpoints, args)
+
+    return save
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
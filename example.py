@@ -47,11 +47,16 @@ save.run_base_updates(write=True)
 process transactions
 
 - run_tx_execute(): perform roster transactions
+- balance_rosters(): create transactions to fill empty/thin positions and meet roster limit
 '''
 
 # execute tx
 save.run_tx_execute(write=True)
 
+# balance rosters (optional): sign/release players to fill empty positions and meet 53-man limit
+#tx_bal = save.balance_rosters()
+#save.run_tx_execute(write=True, tx=tx_bal)
+
 
 '''
 apply player/team updates
@@ -59,6 +64,7 @@ apply player/team updates
 - update_ratings_custom(): update player ratings based on external data
 - update_salaries(): update salaries by transaction type
 - reorder_dcht(): reorder depth charts by highest overall rating
+- update_team_ratings(): update team ratings for teams with changed starters
 '''
 
 # apply custom ratings updates
@@ -70,6 +76,9 @@ save.update_salaries(write=True)
 # reorder depth charts
 save.reorder_dcht(write=True)
 
+# update team ratings
+save.update_team_ratings(write=True)
+
 
 '''
 apply final updates
@@ -0,0 +1,165 @@
+"""
+Save stage instrumentation tools
+"""
+
+import json
+import time
+import inspect
+import functools
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from change_log import change_keys
+
+
+def hash_rows(data):
+    '''
+    hash data frame rows (numeric columns compared as float so int/float casts do not count as changes)
+    '''
+
+    d = data.copy()
+    cols_num = d.select_dtypes([np.number]).columns
+    d[cols_num] = d[cols_num].astype('float64')
+
+    return pd.util.hash_pandas_object(d, index=False)
+
+
+def get_changed_rows(before, after):
+    '''
+    flag rows in after data that are new or modified vs. before data
+    '''
+
+    cols = [c for c in after.columns if c in before.columns]
+    hb = hash_rows(before[cols])
+    ha = hash_rows(after[cols])
+
+    return ~ha.isin(hb.values)
+
+
+def get_save_tables(save):
+    '''
+    get change-logged Save tables (dict of table -> data frame)
+    '''
+
+    return {t: getattr(save, f"sv_{t}") for t in change_keys}
+
+
+def log_changes(stage):
+    '''
+    decorator for Save helper methods that write tables outside a stage method; writes are recorded in the
+    Save change log (if any) as a run of stage
+    '''
+
+    def decorator(method):
+        sig = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = sig.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            log = getattr(self, 'change_log', None) if bound.arguments.get('write', False) else None
+            if log is None:
+                return method(self, *args, **kwargs)
+
+            tables = get_save_tables(self)
+            out = method(self, *args, **kwargs)
+            log.record(stage, tables, get_save_tables(self))
+
+            return out
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_stage(stage, table='play'):
+    '''
+    decorator for Save stage methods; records duration, memory delta and row counts for table
+
+    - memory is recorded when tracemalloc is tracing (peak is since stage start on Python 3.9+, else since
+      tracing started)
+    - stages are recorded when the Save is instrumented (Save(config, instrument=True))
+    - rows_changed counts new or modified rows in stage output
+    - writes are recorded in the Save change log (if any), whether or not the stage is instrumented; log_seconds
+      is the change log record time (not included in seconds)
+    '''
+
+    def decorator(method):
+        sig = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = sig.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            write = bound.arguments.get('write', False)
+            log = getattr(self, 'change_log', None) if write else None
+            if log is not None:
+                tables = get_save_tables(self)
+
+            if not getattr(self, 'instrument', False):
+                out = method(self, *args, **kwargs)
+                if log is not None:
+                    log.record(stage, tables, get_save_tables(self))
+                return out
+
+            before = getattr(self, f"sv_{table}")
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                if hasattr(tracemalloc, 'reset_peak'):
+                    tracemalloc.reset_peak()
+                mem_start = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+
+            out = method(self, *args, **kwargs)
+
+            seconds = time.perf_counter() - start
+            if tracing:
+                mem_end, mem_peak = tracemalloc.get_traced_memory()
+            after = getattr(self, f"sv_{table}") if write else out
+            if log is not None:
+                log_start = time.perf_counter()
+                log.record(stage, tables, get_save_tables(self))
+                log_seconds = time.perf_counter() - log_start
+
+            rec = {
+                'stage': stage,
+                'method': method.__name__,
+                'table': table,
+                'write': bool(write),
+                'start': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'seconds': round(seconds, 4),
+                'log_seconds': round(log_seconds, 4) if log is not None else None,
+                'mem_delta_mb': round((mem_end - mem_start) / 1024**2, 2) if tracing else None,
+                'mem_peak_mb': round((mem_peak - mem_start) / 1024**2, 2) if tracing else None,
+                'rows_in': int(before.shape[0]),
+                'rows_out': int(after.shape[0]) if after is not None else None,
+                'rows_changed': int(get_changed_rows(before, after).sum()) if after is not None else None
+            }
+            self.stage_log.append(rec)
+            for callback in self.stage_callbacks:
+                callback(rec)
+
+            return out
+
+        return wrapper
+
+    return decorator
+
+
+def export_stage_log(records, path, append=False):
+    '''
+    write stage records as JSON lines
+    '''
+
+    with open(path, 'a' if append else 'w') as file:
+        for rec in records:
+            file.write(json.dumps(rec) + '\n')
+
+
+def read_stage_log(path):
+    '''
+    read stage records from JSON lines into data frame
+    '''
+
+    return pd.read_json(path, lines=True)
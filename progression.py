@@ -0,0 +1,157 @@
+"""
+Multi-season player progression and aging
+
+- advances age (PAGE), years pro (PYRP), years with team (PYWT) and contract years left (PCYL) each season
+  (PAGE/PYRP within data dict ranges)
+- attributes progress before and regress after a peak age by position and attribute class, with seeded
+  normal noise; POVR is recalculated every season
+- all players of one or many leagues and many independent runs are advanced together as
+  (run x player x attribute) arrays; seasons are the only loop
+- note: expired contracts (PCYL 0) are not released; use transactions or roster_balancer.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from save_tools import get_column_ranges
+from scenarios import get_attr_cols, predict_povr_stack
+
+
+def get_age_curves():
+    '''
+    create spec for age curves
+
+    - peak: peak age by position
+    - attrs: attribute class curves; offset (years vs. position peak), grow (points/season before peak),
+      decline (points/season after peak), accel (decline increase per season past peak)
+    - sd: attribute change noise (points/season)
+    '''
+
+    peak = {
+        0: 30, # qb
+        1: 26, # hb
+        2: 27, # fb
+        3: 27, # wr
+        4: 28, # te
+        5: 29, 6: 29, 7: 29, 8: 29, 9: 29, # ol
+        10: 28, 11: 28, 12: 28, # dl
+        13: 28, 14: 28, 15: 28, # lb
+        16: 27, # cb
+        17: 28, 18: 28, # s
+        19: 32, 20: 32 # k, p
+    }
+
+    physical = {'offset': -3, 'grow': 0.5, 'decline': 1.0, 'accel': 0.15}
+    strength = {'offset': 2, 'grow': 1.0, 'decline': 1.5, 'accel': 0.3}
+    skill = {'offset': 0, 'grow': 1.5, 'decline': 1.0, 'accel': 0.2}
+    mental = {'offset': 4, 'grow': 2.5, 'decline': 0.5, 'accel': 0.1}
+
+    attrs = dict(
+        **{c: physical for c in ['pspd','pacc','pagi','pjmp','pkrt','psta','pinj']},
+        **{c: strength for c in ['pstr']},
+        **{c: skill for c in ['pcth','pcar','pbtk','ptak','pthp','ptha','ppbk','prbk','pkpr','pkac']},
+        **{c: mental for c in ['pawr','ptgh']}
+    )
+
+    return {'peak': peak, 'attrs': attrs, 'sd': 1.5}
+
+
+def get_curve_params(play, cols_attr, curves):
+    '''
+    get curve parameter arrays: peak age (player x attribute) and grow/decline/accel (attribute)
+    '''
+
+    peak_pos = play['ppos'].map(curves['peak']).fillna(28).values.astype('float64')
+    params = {k: np.array([curves['attrs'].get(c, {}).get(k, 0) for c in cols_attr], dtype='float64')
+              for k in ['offset','grow','decline','accel']}
+    params['peak'] = peak_pos[:,None] + params.pop('offset')[None,:]
+
+    return params
+
+
+def advance_season(state, params, rng, sd, lo, hi, ranges=None):
+    '''
+    advance state arrays one season (in place); attrs are (run x player x attribute), others (run x player)
+
+    - PAGE/PYRP are capped at data dict range maximums (ranges), if given
+    '''
+
+    # attribute changes by age vs. peak (age at start of season)
+    age = state['page'][:,:,None].astype('float64')
+    past = np.maximum(age - params['peak'][None,:,:], 0)
+    mean = np.where(past==0, params['grow'], -params['decline']*(1 + params['accel']*past))
+    delta = np.round(mean + rng.normal(0, sd, state['attrs'].shape))
+    state['attrs'] = np.clip(state['attrs'] + delta, lo, hi)
+
+    # bio/contract columns
+    ranges = {} if ranges is None else ranges
+    state['page'] = np.minimum(state['page'] + 1, ranges.get('page', (0, np.inf))[1]).astype('int64')
+    state['pyrp'] = np.minimum(state['pyrp'] + 1, ranges.get('pyrp', (0, np.inf))[1]).astype('int64')
+    state['pcyl'] = np.maximum(state['pcyl'] - 1, 0)
+    state['pywt'] = np.where(state['rostered'] & (state['pywt'] < 30), state['pywt'] + 1, state['pywt'])
+
+
+def simulate_seasons(play, ddplay, calc_map, seasons=1, runs=1, seed=0, curves=None):
+    '''
+    simulate seasons of progression for PLAY table (runs are independent random draws)
+
+    - returns final state arrays (see to_play) and POVR/age history by run, season and player
+    '''
+
+    sp = play.reset_index(drop=True)
+    curves = get_age_curves() if curves is None else curves
+    cols_attr = get_attr_cols(ddplay)
+    ranges = get_column_ranges(ddplay)
+    lo = np.array([ranges.get(c, (0,99))[0] for c in cols_attr], dtype='float64')
+    hi = np.array([ranges.get(c, (0,99))[1] for c in cols_attr], dtype='float64')
+    params = get_curve_params(sp, cols_attr, curves)
+    rng = np.random.default_rng(seed)
+
+    state = {c: np.repeat(sp[c].values[None,:].astype('int64'), runs, axis=0) for c in ['page','pyrp','pcyl','pywt']}
+    state['attrs'] = np.repeat(sp[cols_attr].values[None,:,:].astype('float64'), runs, axis=0)
+    state['rostered'] = sp['tgid'].isin(range(1,33)).values[None,:]
+
+    hist = []
+    for season in range(1, seasons+1):
+        advance_season(state, params, rng, curves['sd'], lo, hi, ranges=ranges)
+        state['povr'] = predict_povr_stack(sp, state['attrs'], cols_attr, calc_map)
+        hist.append(pd.DataFrame({
+            'run': np.repeat(np.arange(runs), sp.shape[0]),
+            'season': season,
+            'pgid': np.tile(sp['pgid'].values, runs),
+            'page': state['page'].ravel(),
+            'povr': state['povr'].ravel().astype('int64')
+        }))
+    for col in [c for c in ['league'] if c in sp.columns]:
+        for h in hist:
+            h.insert(0, col, np.tile(sp[col].values, runs))
+
+    state['cols_attr'] = cols_attr
+    history = pd.concat(hist, axis=0, ignore_index=True) if len(hist)>0 else pd.DataFrame()
+
+    return state, history
+
+
+def to_play(play, state, run=0):
+    '''
+    create PLAY table from simulated state for one run
+    '''
+
+    sp = play.reset_index(drop=True).copy()
+    for col in ['page','pyrp','pcyl','pywt']:
+        sp[col] = state[col][run]
+    sp[state['cols_attr']] = state['attrs'][run].astype('int64')
+    if 'povr' in state:
+        sp['povr'] = state['povr'][run].astype('int64')
+
+    return sp
+
+
+def simulate_leagues(plays, ddplay, calc_map, seasons=1, runs=1, seed=0, curves=None):
+    '''
+    simulate seasons for many leagues (list of PLAY tables) in one batch; history includes league number
+    '''
+
+    sp = pd.concat([p.assign(league=i) for i, p in enumerate(plays)], axis=0, ignore_index=True)
+
+    return simulate_seasons(sp, ddplay, calc_map, seasons=seasons, runs=runs, seed=seed, curves=curves)
@@ -0,0 +1,302 @@
+"""
+Read-only query server over a loaded Save
+
+- holds one updated Save snapshot (PLAY, TEAM, DCHT and validation summary) in memory and answers
+  concurrent HTTP requests with JSON
+- snapshots are never modified; reloads build a new snapshot in the background and swap it in, so
+  queries are never blocked by a reload
+- usage: `python query_server.py --port 8765`, then e.g. `curl "localhost:8765/player?name=ray lewis"`
+
+Endpoints (GET unless noted):
+- /player?name=NAME: player search (single name is treated as last name)
+- /roster?team=TEAM: team roster (TEAM is team short name or TGID)
+- /dcht?team=TEAM: team depth chart
+- /validation: validation summary (issue counts and rows by check)
+- /status: snapshot version, load time and reload state
+- /reload (POST): reload save and update files from config
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+import yaml
+import pandas as pd
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from save_updater import Save, save_stages
+from save_tools import get_ppos_maps, get_tgid_maps, find_player
+
+
+def summarize_report(report):
+    '''
+    convert validation report into JSON-serializable summary (ok flag, issue count and rows by check)
+    '''
+
+    out = {}
+    for check, res in report.items():
+        if isinstance(res, pd.DataFrame):
+            out[check] = {'ok': res.shape[0]==0, 'count': int(res.shape[0]), 'rows': json.loads(res.to_json(orient='records'))}
+        elif isinstance(res, list):
+            out[check] = {'ok': len(res)==0, 'count': len(res), 'rows': res}
+        else:
+            out[check] = {'ok': bool(res), 'count': 0 if res else 1, 'rows': []}
+
+    return out
+
+
+class Snapshot():
+    '''
+    Immutable query snapshot of updated save tables
+    '''
+
+    def __init__(self, save, version, stages):
+
+        self.version = version
+        self.stages = list(stages)
+        self.created = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.play = save.sv_play.copy()
+        self.team = save.sv_team.copy()
+        self.dcht = save.sv_dcht.copy()
+        self.ppos_map = get_ppos_maps()[0]
+        self.tgid_maps = get_tgid_maps(self.team)
+        self.tgid_map, self.tgid_map_r = self.tgid_maps
+        self.name_codes = save.name_codes
+        self.validation = summarize_report(save.validate_play())
+
+
+    def get_tgid(self, team):
+        '''
+        resolve team short name or TGID
+        '''
+
+        team = str(team).strip()
+        if team.isdigit():
+            tgid = int(team)
+        else:
+            tgid = {k.lower(): v for k, v in self.tgid_map_r.items()}.get(team.lower())
+        if tgid not in self.tgid_map:
+            raise KeyError(f"Unknown team: {team}")
+
+        return tgid
+
+
+    def player(self, name):
+        '''
+        player search
+        '''
+
+        out = find_player(name, self.play, self.team, tgid_maps=self.tgid_maps, name_codes=self.name_codes)
+
+        return [] if out is None else json.loads(out.to_json(orient='records'))
+
+
+    def roster(self, team):
+        '''
+        team roster sorted by position and POVR
+        '''
+
+        tgid = self.get_tgid(team)
+        cols = ['pgid','pfna','plna','ppos','pos','pjen','povr','pimp','page','tgid']
+        out = self.play.loc[self.play['tgid']==tgid].sort_values(['ppos','povr'], ascending=[True,False])
+        out = out.assign(pos=[self.ppos_map.get(i) for i in out['ppos']])[cols]
+
+        return json.loads(out.to_json(orient='records'))
+
+
+    def depth_chart(self, team):
+        '''
+        team depth chart with player names and POVR
+        '''
+
+        tgid = self.get_tgid(team)
+        out = self.dcht.loc[self.dcht['tgid']==tgid].merge(
+            self.play[['pgid','pfna','plna','povr']], on='pgid', how='left')
+        out.sort_values(['ppos','ddep'], inplace=True)
+        out['pos'] = [self.ppos_map.get(i) for i in out['ppos']]
+        out = out[['tgid','ppos','pos','ddep','pgid','pfna','plna','povr']]
+
+        return json.loads(out.to_json(orient='records'))
+
+
+    def status(self):
+        '''
+        snapshot details
+        '''
+
+        return {'version': self.version, 'created': self.created, 'stages': self.stages,
+                'players': int(self.play.shape[0]), 'teams': int(self.team.shape[0])}
+
+
+class QueryServer():
+    '''
+    Snapshot holder and reload manager for query handlers
+    '''
+
+    def __init__(self, config, stages=None):
+
+        self.config = config
+        self.stages = list(save_stages.keys()) if stages is None else list(stages)
+        self.snapshot = None
+        self.version = 0
+        self.reload_error = None
+        self._reload_lock = threading.Lock()
+        self._reloading = False
+        self.reload(background=False)
+
+
+    def _build_snapshot(self):
+        '''
+        load save, run stages and swap in new snapshot
+        '''
+
+        # stage/validation output is printed to server console (stdout redirection is not thread-safe)
+        try:
+            save = Save(self.config)
+            save.run_stages(self.stages)
+            snapshot = Snapshot(save, self.version+1, self.stages)
+            self.version += 1
+            self.snapshot = snapshot
+            self.reload_error = None
+        except Exception as e:
+            self.reload_error = repr(e)
+            if self.snapshot is None:
+                raise
+        finally:
+            self._reloading = False
+            self._reload_lock.release()
+
+
+    def reload(self, background=True):
+        '''
+        rebuild snapshot (background thread by default); returns False if a reload is already running
+        '''
+
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self._reloading = True
+        if background:
+            threading.Thread(target=self._build_snapshot, daemon=True).start()
+        else:
+            self._build_snapshot()
+
+        return True
+
+
+    def status(self):
+        '''
+        current snapshot and reload state
+        '''
+
+        return dict(self.snapshot.status(), reloading=self._reloading, reload_error=self.reload_error)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    '''
+    HTTP request handler (queries use the snapshot current at request start)
+    '''
+
+    routes = {
+        '/player': ('player', ['name']),
+        '/roster': ('roster', ['team']),
+        '/dcht': ('depth_chart', ['team']),
+        '/validation': (None, []),
+        '/status': (None, [])
+    }
+
+
+    def send_json(self, data, code=200):
+
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        qs = self.server.query_server
+        snapshot = qs.snapshot
+
+        if url.path not in self.routes:
+            return self.send_json({'error': f"Unknown path: {url.path}"}, 404)
+        method, args = self.routes[url.path]
+        missing = [a for a in args if a not in params]
+        if len(missing)>0:
+            return self.send_json({'error': f"Missing parameters: {', '.join(missing)}"}, 400)
+
+        try:
+            if url.path=='/status':
+                data = qs.status()
+            elif url.path=='/validation':
+                data = snapshot.validation
+            else:
+                data = getattr(snapshot, method)(*[params[a] for a in args])
+        except KeyError as e:
+            return self.send_json({'error': str(e.args[0])}, 404)
+        except Exception as e:
+            return self.send_json({'error': repr(e)}, 500)
+
+        self.send_json({'version': snapshot.version, 'data': data})
+
+
+    def do_POST(self):
+
+        url = urlparse(self.path)
+        if url.path != '/reload':
+            return self.send_json({'error': f"Unknown path: {url.path}"}, 404)
+        started = self.server.query_server.reload()
+        self.send_json({'reloading': True, 'started': started}, 202)
+
+
+    def log_message(self, format, *args):
+
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(config, host='127.0.0.1', port=8765, stages=None, verbose=False):
+    '''
+    create HTTP query server with loaded snapshot
+    '''
+
+    httpd = ThreadingHTTPServer((host, port), QueryHandler)
+    httpd.daemon_threads = True
+    httpd.query_server = QueryServer(config, stages=stages)
+    httpd.verbose = verbose
+
+    return httpd
+
+
+def main(args=None):
+
+    parser = argparse.ArgumentParser(description='Serve read-only queries over an updated roster save')
+    parser.add_argument('-c', '--config', default='config.yaml', help='config file (default: config.yaml)')
+    parser.add_argument('-s', '--stages', nargs='*', choices=list(save_stages.keys()), default=None,
+                        help='stages to run before serving (default: all)')
+    parser.add_argument('--host', default='127.0.0.1', help='host (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log requests')
+    args = parser.parse_args(args)
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+
+    httpd = make_server(config, host=args.host, port=args.port, stages=args.stages, verbose=args.verbose)
+    print(f"Serving save {config['saves']['import']} on http://{args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopped server")
+    finally:
+        httpd.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
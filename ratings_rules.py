@@ -0,0 +1,128 @@
+"""
+Declarative batch ratings rules
+
+- rules are dicts (or a YAML list, e.g. *updates/PLAY_RULES_UPD.yaml*) with an optional `when` PLAY query
+  and column adjustments: set, add, mul, floor (min value) and cap (max value)
+- e.g. {'name': 'fast rookie WR', 'when': "pos == 'WR' and pyrp == 0 and pspd > 90", 'add': {'pacc': 2}}
+  or {'name': 'injury cap 33+', 'when': 'page >= 33', 'cap': {'pinj': 80}}
+- adjustment values are numbers or PLAY expressions (e.g. {'cap': {'pinj': '110 - page'}})
+- queries and expressions are evaluated once each on the input PLAY table (position names available as
+  pos), so rules do not see each other's changes; adjustments are applied in rule order as array operations
+- results are rounded and clipped to data dict ranges, and POVR is rescored once for changed players
+"""
+
+import yaml
+import numpy as np
+import pandas as pd
+
+from save_tools import get_column_ranges, predict_povr_vec
+from scenarios import get_attr_cols, get_query_columns, eval_query
+
+
+# rule adjustments and array operations
+rule_ops = {
+    'set': lambda x, v: v,
+    'add': lambda x, v: x + v,
+    'mul': lambda x, v: x * v,
+    'floor': lambda x, v: np.maximum(x, v),
+    'cap': lambda x, v: np.minimum(x, v)
+}
+
+
+def load_rules(path):
+    '''
+    load rules from YAML file (list of rules, or dict with rules key)
+    '''
+
+    with open(path, 'r') as file:
+        rules = yaml.safe_load(file)
+    if isinstance(rules, dict):
+        rules = rules.get('rules', [])
+
+    return [] if rules is None else rules
+
+
+def compile_rules(rules, cols_attr):
+    '''
+    check rules and convert to (name, query, [(op, column index, value)]) tuples
+    '''
+
+    col_idx = {c: i for i, c in enumerate(cols_attr)}
+    out = []
+    for i, rule in enumerate(rules):
+        name = rule.get('name', f"rule_{i}")
+        bad = [k for k in rule if k not in ['name','when'] and k not in rule_ops]
+        if len(bad)>0:
+            raise Exception(f"Unknown rule operations ({name}): {', '.join(bad)}")
+        ops = []
+        for op, adj in [(k, v) for k, v in rule.items() if k in rule_ops]:
+            bad = [c for c in adj if c not in col_idx]
+            if len(bad)>0:
+                raise Exception(f"Unknown rule columns ({name}): {', '.join(bad)}")
+            ops += [(op, col_idx[c], v) for c, v in adj.items()]
+        out.append((name, rule.get('when'), ops))
+
+    return out
+
+
+def get_rule_arrays(play, compiled):
+    '''
+    evaluate each distinct rule query and expression value once on PLAY table
+    '''
+
+    cols = get_query_columns(play)
+    queries = set(q for _, q, _ in compiled if q)
+    exprs = set(v for _, _, ops in compiled for _, _, v in ops if isinstance(v, str))
+
+    masks = {q: eval_query(q, cols, bool) for q in queries}
+    values = {e: eval_query(e, cols, 'float64') for e in exprs}
+
+    return masks, values
+
+
+def apply_rules(play, ddplay, calc_map, rules):
+    '''
+    apply ratings rules to PLAY table and rescore POVR for changed players
+
+    - returns updated PLAY table and summary by rule (matched players, players changed by rule)
+    '''
+
+    sp = play.copy()
+    cols_attr = get_attr_cols(ddplay)
+    compiled = compile_rules(rules, cols_attr)
+    masks, values = get_rule_arrays(sp, compiled)
+
+    # apply adjustments in rule order
+    base = sp[cols_attr].values.astype('float64')
+    x = base.copy()
+    summary = []
+    for name, query, ops in compiled:
+        mask = masks[query] if query else np.ones(sp.shape[0], dtype=bool)
+        rows = np.flatnonzero(mask)
+        changed = np.zeros(rows.shape[0], dtype=bool)
+        for op, j, val in ops:
+            v = values[val][rows] if isinstance(val, str) else val
+            old = x[rows, j]
+            new = rule_ops[op](old, v)
+            changed |= ~((old == new) | np.isnan(new))
+            x[rows, j] = np.where(np.isnan(new), old, new)
+        summary.append({'rule': name, 'matched': int(rows.shape[0]), 'changed': int(changed.sum())})
+
+    # round/clip to data dict ranges
+    ranges = get_column_ranges(ddplay)
+    lo = np.array([ranges.get(c, (0,99))[0] for c in cols_attr], dtype='float64')
+    hi = np.array([ranges.get(c, (0,99))[1] for c in cols_attr], dtype='float64')
+    x = np.clip(np.round(x), lo, hi)
+    x = np.where(np.isnan(base), base, x)
+
+    # write changed players and rescore POVR once
+    upd = ((x != base) & ~np.isnan(base)).any(axis=1)
+    if upd.any():
+        for j, col in enumerate(cols_attr):
+            vals = pd.Series(x[upd, j], index=sp.index[upd])
+            sp.loc[upd, col] = vals.astype(sp[col].dtype) if pd.api.types.is_integer_dtype(sp[col]) else vals
+        povr = predict_povr_vec(sp.loc[upd], calc_map)
+        povr = povr.fillna(sp.loc[upd, 'povr'])
+        sp.loc[upd, 'povr'] = povr.astype(sp['povr'].dtype) if pd.api.types.is_integer_dtype(sp['povr']) else povr
+
+    return sp, pd.DataFrame(summary, columns=['rule','matched','changed'])
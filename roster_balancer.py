@@ -0,0 +1,134 @@
+"""
+Roster balancing against the 53-man limit
+
+- signs best available free agents (highest POVR, then PIMP) into empty/thin positions and releases
+  lowest value surplus players (lowest PIMP, then POVR) from teams over the roster limit
+- free agents are kept in per-position priority queues (max heaps) and team surplus in per-team
+  min heaps, so each signing/release is O(log n)
+- output is a transaction table in PLAY_TXS_UPD format (executed with `Save.run_tx_execute(tx=...)`)
+"""
+
+import heapq
+import pandas as pd
+
+from save_tools import get_ppos_maps, get_tgid_maps, get_ddep_max
+
+
+def get_roster_min():
+    '''
+    create spec for min players by position
+    '''
+
+    roster_min = {
+        0: 2, # qb
+        1: 2, # hb
+        2: 1, # fb
+        3: 4, # wr
+        4: 2, # te
+        5: 1, # lt
+        6: 1, # lg
+        7: 1, # c
+        8: 1, # rg
+        9: 1, # rt
+        10: 1, # le
+        11: 1, # re
+        12: 2, # dt
+        13: 1, # lolb
+        14: 1, # mlb
+        15: 1, # rolb
+        16: 3, # cb
+        17: 1, # fs
+        18: 1, # ss
+        19: 1, # k
+        20: 1 # p
+    }
+
+    return roster_min
+
+
+def balance_rosters(play, team, limit=53, roster_min=None, roster_target=None, date=None):
+    '''
+    create transactions that fill positions below min and bring rosters to limit
+
+    - 1) sign free agents at positions below roster_min (largest shortfall first)
+    - 2) release lowest value players at positions above roster_min from teams over limit
+    - 3) sign free agents for teams under limit at positions furthest below roster_target (depth chart size)
+    - each player has at most one transaction (players released in 2 are not re-signed in 3), since
+      transactions are executed by PGID
+    '''
+
+    sp = play.loc[play['ppos'].isin(range(0,21))]
+    ppos_map = get_ppos_maps()[0]
+    tgid_map = get_tgid_maps(team)[0]
+    roster_min = get_roster_min() if roster_min is None else roster_min
+    roster_target = get_ddep_max() if roster_target is None else roster_target
+    date = pd.Timestamp.today().strftime('%Y-%m-%d') if date is None else date
+
+    players = sp.set_index('pgid')[['pfna','plna','ppos','povr','pimp']].to_dict('index')
+    rostered = sp.loc[sp['tgid'].isin(range(1,33))]
+    fa = sp.loc[sp['tgid']==1009]
+
+    # free agent max heaps by position
+    fa_heaps = {p: [] for p in range(0,21)}
+    for pgid, ppos, povr, pimp in zip(fa['pgid'], fa['ppos'], fa['povr'], fa['pimp']):
+        fa_heaps[ppos].append((-povr, -pimp, pgid))
+    for heap in fa_heaps.values():
+        heapq.heapify(heap)
+
+    # roster counts
+    counts = rostered.groupby(['tgid','ppos']).size().to_dict()
+    size = rostered.groupby('tgid').size().reindex(range(1,33), fill_value=0).to_dict()
+    txs = []
+
+    def sign(tgid, ppos):
+        if len(fa_heaps[ppos])==0:
+            return False
+        pgid = heapq.heappop(fa_heaps[ppos])[2]
+        counts[(tgid,ppos)] = counts.get((tgid,ppos), 0) + 1
+        size[tgid] += 1
+        txs.append((pgid, 'sign', 1009, tgid))
+        return True
+
+    # 1) positions below min (largest shortfall first)
+    need = [(counts.get((t,p), 0) - n, t, p) for t in range(1,33) for p, n in roster_min.items() if counts.get((t,p), 0) < n]
+    heapq.heapify(need)
+    while need:
+        short, tgid, ppos = heapq.heappop(need)
+        if sign(tgid, ppos) and short+1 < 0:
+            heapq.heappush(need, (short+1, tgid, ppos))
+
+    # 2) release lowest value surplus from teams over limit
+    signed = set(tx[0] for tx in txs)
+    for tgid in [t for t in range(1,33) if size[t] > limit]:
+        tm = rostered.loc[(rostered['tgid']==tgid) & ~rostered['pgid'].isin(signed)]
+        heap = list(zip(tm['pimp'], tm['povr'], tm['pgid'], tm['ppos']))
+        heapq.heapify(heap)
+        while heap and size[tgid] > limit:
+            _, _, pgid, ppos = heapq.heappop(heap)
+            if counts[(tgid,ppos)] <= roster_min.get(ppos, 0):
+                continue
+            counts[(tgid,ppos)] -= 1
+            size[tgid] -= 1
+            txs.append((pgid, 'release', tgid, 1009))
+
+    # 3) fill teams under limit at thinnest positions (furthest below target depth)
+    for tgid in [t for t in range(1,33) if size[t] < limit]:
+        thin = [(counts.get((tgid,p), 0) - roster_target.get(p, 0), p) for p in range(0,21)]
+        heapq.heapify(thin)
+        while thin and size[tgid] < limit:
+            deficit, ppos = heapq.heappop(thin)
+            if sign(tgid, ppos):
+                heapq.heappush(thin, (deficit+1, ppos))
+
+    # output in PLAY_TXS_UPD format
+    out = pd.DataFrame(txs, columns=['pgid','tx','tgid_fr','tgid_to'])
+    out.insert(0, 'txid', range(out.shape[0]))
+    out.insert(1, 'date', date)
+    for col in ['pfna','plna','ppos','povr']:
+        out[col] = [players[i][col] for i in out['pgid']]
+    out['pos'] = [ppos_map[i] for i in out['ppos']]
+    out['tsna_fr'] = [tgid_map.get(i, 'FA') for i in out['tgid_fr']]
+    out['tsna_to'] = [tgid_map.get(i, 'FA') for i in out['tgid_to']]
+    out = out[['txid','date','pgid','pfna','plna','pos','povr','tx','tsna_fr','tsna_to','tgid_fr','tgid_to']]
+
+    return out
@@ -2,10 +2,12 @@
 Roster save tools and utilities
 """
 
+import sys
+import bisect
 import numpy as np
 import pandas as pd
 
-from utils import is_unique, coalesce
+from utils import is_unique, coalesce, sort_table, merge_sorted
 
 
 def get_ppos_maps():
@@ -35,34 +37,179 @@ def get_tgid_maps(team):
     return tgid_map, tgid_map_r
 
 
-def find_player(name, play, team, cols=None):
+class PlayIndex():
     '''
-    player name lookup
+    group indexes (row positions) on PLAY key columns (pgid, tgid, ppos)
+
+    - rostered/fa: rostered players (tgid 1-32) and free agents (tgid 1009)
+    - team_rows: tgid -> rows; team_pos_rows: (tgid, ppos) -> rows
+    - indexes are valid while key columns are unchanged (see is_current)
     '''
 
-    sp = play.copy()
-    st = team.copy()
+    cols = ['pgid','tgid','ppos']
+
+    def __init__(self, play):
+
+        self.keys = {c: play[c].values.copy() for c in self.cols}
+        tgid = self.keys['tgid']
+        self.rostered = np.flatnonzero(np.isin(tgid, range(1,33)))
+        self.fa = np.flatnonzero(tgid==1009)
+        keys = pd.DataFrame(self.keys)
+        self.team_rows = keys.groupby('tgid').indices
+        self.team_pos_rows = keys.groupby(['tgid','ppos']).indices
+
+
+    def is_current(self, play):
+        '''
+        check if key columns of PLAY table match indexed data
+        '''
+
+        return all(c in play.columns and play[c].shape==v.shape and
+                   np.array_equal(play[c].values, v, equal_nan=v.dtype.kind=='f') for c, v in self.keys.items())
+
+
+    def get_rows(self, tgids):
+        '''
+        get sorted row positions for teams
+        '''
+
+        rows = [self.team_rows[t] for t in tgids if t in self.team_rows]
+
+        return np.sort(np.concatenate(rows)) if len(rows)>0 else np.array([], dtype='int64')
+
+
+    def get_counts(self, by='team'):
+        '''
+        get player counts by team or team/position
+        '''
+
+        rows = self.team_rows if by=='team' else self.team_pos_rows
+
+        return {k: len(v) for k, v in rows.items()}
+
+
+def get_play_index(play, index=None):
+    '''
+    get PLAY group indexes (reuses index if still current)
+    '''
+
+    if index is not None and index.is_current(play):
+        return index
+
+    return PlayIndex(play)
+
+
+def normalize_names(names):
+    '''
+    normalize names for matching (lowercase; punctuation, extra whitespace and suffixes removed)
+    '''
+
+    nm = pd.Series(names, dtype='object').fillna('').astype(str).str.lower()
+    nm = nm.str.replace(r"[.,'`]", '', regex=True).str.replace('-', ' ', regex=False)
+    nm = nm.str.replace(r'\s+', ' ', regex=True).str.strip()
+    nm = nm.str.replace(r'(?<=\S) (jr|sr|ii|iii|iv|v)$', '', regex=True)
+
+    return nm.values
+
+
+class NameCodes():
+    '''
+    interned normalized names with integer codes
+
+    - pnky: full name (first and last) code; plky: last name code
+    - codes are stable for the instance; unknown names encode to -1 when not added
+    '''
+
+    cols = ['pnky','plky']
+
+    def __init__(self):
+
+        self.codes = {}
+        self.names = []
+
+
+    def encode(self, names, add=True):
+        '''
+        get codes for normalized names (new names are interned and added if add=True)
+        '''
+
+        nm = pd.Series(names, dtype='object')
+        if add:
+            for name in pd.unique(nm[~nm.isin(self.codes.keys())]):
+                name = sys.intern(name)
+                self.codes[name] = len(self.names)
+                self.names.append(name)
+
+        return nm.map(self.codes).fillna(-1).astype('int64').values
+
+
+    def encode_names(self, pfna, plna, add=True):
+        '''
+        get full name and last name codes for first/last name columns
+        '''
+
+        last = normalize_names(plna)
+        full = (pd.Series(normalize_names(pfna)) + ' ' + last).str.strip().values
+
+        return self.encode(full, add=add), self.encode(last, add=add)
+
+
+    def add_keys(self, play, rows=None):
+        '''
+        add/update name key columns on PLAY rows (all rows or boolean mask)
+        '''
+
+        sp = play.copy()
+        if rows is None or any(c not in sp.columns for c in self.cols):
+            rows = np.ones(sp.shape[0], dtype=bool)
+        rows = np.asarray(rows)
+        pnky, plky = self.encode_names(sp['pfna'].values[rows], sp['plna'].values[rows])
+        for col, codes in zip(self.cols, [pnky, plky]):
+            if col not in sp.columns:
+                sp[col] = -1
+            sp.loc[rows, col] = codes
+
+        return sp
+
+
+def find_player(name, play, team, cols=None, tgid_maps=None, name_codes=None):
+    '''
+    player name lookup (optional cached team maps; name key codes used if PLAY has keys)
+
+    - only matched rows are copied (PLAY/TEAM are not modified)
+    '''
+
+    sp = play
 
     if not cols:
         cols = ['pgid','pfna','plna','ppos','pos','pjen','povr','tgid','tsna']
 
-    # extract first and last names
-    name = name.lower().strip()
-    if " " in name:
-        pfna, plna = name.split(" ")
-    else:
-        pfna = None
-        plna = name
+    # search play data by name codes (full name, then last name)
+    if name_codes is not None and all(c in sp.columns for c in name_codes.cols):
+        code = name_codes.encode(normalize_names([name]), add=False)[0]
+        out = sp.loc[sp['pnky']==code] if code >= 0 else sp.iloc[0:0]
+        if out.shape[0]==0 and code >= 0:
+            out = sp.loc[sp['plky']==code]
+        out = out.copy()
 
-    # search play data
-    if pfna and plna:
-        out = sp.copy().loc[(sp['pfna'].str.lower()==pfna) & (sp['plna'].str.lower()==plna)]
+    # extract first and last names
     else:
-        out = sp.copy().loc[(sp['plna'].str.lower()==plna)]
+        name = name.lower().strip()
+        if " " in name:
+            pfna, plna = name.split(" ")
+        else:
+            pfna = None
+            plna = name
+
+        # search play data
+        if pfna and plna:
+            out = sp.loc[(sp['pfna'].str.lower()==pfna) & (sp['plna'].str.lower()==plna)].copy()
+        else:
+            out = sp.loc[(sp['plna'].str.lower()==plna)].copy()
 
     if out.shape[0]>0:
         ppos_map = get_ppos_maps()[0]
-        tgid_map = get_tgid_maps(st)[0]
+        tgid_map = get_tgid_maps(team)[0] if tgid_maps is None else tgid_maps[0]
         out['pos'] = [ppos_map[i] for i in out['ppos']]
         out['tsna'] = [tgid_map[i] for i in out['tgid']]
         out = out[cols]
@@ -83,6 +230,30 @@ def predict_povr(row, calc_map):
     return pred_scale
 
 
+def predict_povr_vec(play, calc_map):
+    '''
+    get player rating predictions for all rows (vectorized by position)
+    '''
+
+    sp = play
+    pred = np.full(sp.shape[0], np.nan)
+    ppos = sp['ppos'].values
+    for pos, calc_ in calc_map.items():
+        mask = ppos==pos
+        if not mask.any():
+            continue
+        calc = calc_['coef_imp']
+        xvars = [i for i in calc.index if i != 'Intercept']
+        # accumulate in column order so rounding matches predict_povr
+        x = sp.loc[mask, xvars].values.astype('float64')
+        pred_raw = np.zeros(x.shape[0])
+        for i, var in enumerate(xvars):
+            pred_raw = pred_raw + x[:,i]*calc[var]
+        pred[mask] = np.clip((pred_raw + calc['Intercept']).round(0), 0, 99)
+
+    return pd.Series(pred, index=sp.index)
+
+
 def predict_pimp(row, calc_map):
     '''
     get player importance prediction using custom calculation
@@ -96,14 +267,74 @@ def predict_pimp(row, calc_map):
     return pred_scale
 
 
-def update_dcht(play):
+def predict_pimp_vec(play, calc_map):
     '''
-    update depth chart from PLAY table
+    get player importance predictions for all rows (requires ddep column)
     '''
 
-    sp = play.copy()
+    sp = play
+    ppos_coef = sp['ppos'].map(calc_map['ppos']).values.astype('float64')
+    pred_raw = calc_map['Intercept'] + \
+                        calc_map['povr']*sp['povr'].values + \
+                        calc_map['ddep']*sp['ddep'].values + \
+                        ppos_coef
+
+    return pd.Series(np.clip(pred_raw.round(0), 0, 99), index=sp.index)
+
+
+def write_calc(calc_map, path):
+    '''
+    write POVR or PIMP ratings calculator to numpy archive (.npz; no pickled objects)
+    '''
+
+    if 'Intercept' in calc_map:
+        ppos = np.array(sorted(calc_map['ppos']), dtype='int64')
+        np.savez(path, kind='pimp', terms=np.array(['Intercept','povr','ddep']),
+                 coef=np.array([calc_map['Intercept'], calc_map['povr'], calc_map['ddep']], dtype='float64'),
+                 ppos=ppos, ppos_coef=np.array([calc_map['ppos'][i] for i in ppos], dtype='float64'))
+    else:
+        ppos = np.array(list(calc_map.keys()), dtype='int64')
+        terms = calc_map[ppos[0]]['coef_imp'].index
+        np.savez(path, kind='povr', terms=np.array(list(terms), dtype='U'), ppos=ppos,
+                 coef=np.array([calc_map[i]['coef'][terms].values for i in ppos], dtype='float64'),
+                 coef_imp=np.array([calc_map[i]['coef_imp'][terms].values for i in ppos], dtype='float64'))
+
+
+def read_calc(path):
+    '''
+    read POVR or PIMP ratings calculator from numpy archive (.npz)
+    '''
+
+    with np.load(path, allow_pickle=False) as arc:
+        terms = [str(t) for t in arc['terms']]
+        ppos = [int(i) for i in arc['ppos']]
+        if str(arc['kind'])=='pimp':
+            calc_map = {t: np.float64(c) for t, c in zip(terms, arc['coef'])}
+            calc_map['ppos'] = {i: (0 if c==0 else np.float64(c)) for i, c in zip(ppos, arc['ppos_coef'])}
+        else:
+            calc_map = {i: {'coef': pd.Series(arc['coef'][j], index=terms),
+                            'coef_imp': pd.Series(arc['coef_imp'][j], index=terms)} for j, i in enumerate(ppos)}
+
+    return calc_map
+
+
+def get_column_ranges(ddplay):
+    '''
+    get observed value ranges (inclusive) for numeric PLAY columns from data dict
+    '''
+
+    dp = ddplay.copy()
+    dp = dp.loc[dp['range_obs'].str.startswith('[')]
+    ranges = {row[0].lower(): tuple(eval(row[1])) for row in dp[['column','range_obs']].values}
+
+    return ranges
+
+
+def get_ddep_max():
+    '''
+    create spec for max depth chart depth by position
+    '''
 
-    # create spec for max depth by position
     ddep_max = {
         0: 3, # qb
         1: 4, # hb
@@ -133,11 +364,25 @@ def update_dcht(play):
         25: 1 # 3drb
     }
 
+    return ddep_max
+
+
+def update_dcht(play, index=None):
+    '''
+    update depth chart from PLAY table (optional cached PLAY index)
+    '''
+
+    sp = play.copy()
+    sp_tm = sp.iloc[get_play_index(sp, index).rostered]
+
+    # max depth by position
+    ddep_max = get_ddep_max()
+
     # primary positions, except kicker/punter (0-18) - highest PVOR; break ties with PAWR, PSPD
     cols_dcht = ['tgid','pgid','ppos','pfna','plna','povr','ddep','is_valid']
     cols_dcht_out = ['tgid','pgid','ppos','ddep']
 
-    dcht_sort = sp.copy().loc[(sp['tgid'].isin(range(1,33))) & (sp['ppos'].isin(range(0,19)))]
+    dcht_sort = sp_tm.loc[sp_tm['ppos'].isin(range(0,19))].copy()
     dcht_sort.sort_values(by=['tgid','ppos','povr','pawr','pspd'], ascending=[True,True,False,False,False], inplace=True)
     dcht_sort['ddep'] = dcht_sort.groupby(['tgid','ppos']).cumcount()
     dcht_sort['is_valid'] = list(map(lambda x: x[1] <= ddep_max[x[0]]-1, zip(dcht_sort['ppos'], dcht_sort['ddep'])))
@@ -145,7 +390,7 @@ def update_dcht(play):
     dcht_sort = dcht_sort[cols_dcht]
 
     # k (19) - default to kicker
-    dcht_kp = sp.copy().loc[(sp['tgid'].isin(range(1,33))) & (sp['ppos'].isin([19,20]))]
+    dcht_kp = sp_tm.loc[sp_tm['ppos'].isin([19,20])].copy()
     dcht_k = dcht_kp.sort_values(['tgid','ppos','povr'], ascending=[True,True,False]).groupby(['tgid']).head(1)
     dcht_k['ppos'] = 19
     dcht_k['ddep'] = 0
@@ -160,7 +405,7 @@ def update_dcht(play):
     dcht_p = dcht_p[cols_dcht]
 
     # kr/pr (21-22) - highest KRT; break ties with PSPD, PBTK
-    dcht_krt = sp.copy().loc[(sp['tgid'].isin(range(1,33)))]
+    dcht_krt = sp_tm.copy()
     dcht_krt = dcht_krt.sort_values(['tgid','pkrt','pspd','pbtk'], ascending=[True,False,False,False]).groupby(['tgid']).head(1)
     dcht_krt['ppos'] = 21
     dcht_krt['ddep'] = 0
@@ -179,7 +424,7 @@ def update_dcht(play):
     dcht_kos = dcht_kos[cols_dcht]
 
     # los (24) - lowest POVR tight end
-    dcht_los = sp.copy().loc[(sp['tgid'].isin(range(1,33))) & (sp['ppos']==4)]
+    dcht_los = sp_tm.loc[sp_tm['ppos']==4].copy()
     dcht_los = dcht_los.sort_values(['tgid','povr'], ascending=[True,True]).groupby('tgid').head(1)
     dcht_los['ppos'] = 24
     dcht_los['ddep'] = 0
@@ -187,31 +432,136 @@ def update_dcht(play):
     dcht_los = dcht_los[cols_dcht]
 
     # 3drb (25) - best pass catching rb
-    dcht_trb = sp.copy().loc[(sp['tgid'].isin(range(1,33))) & (sp['ppos']==1)]
+    dcht_trb = sp_tm.loc[sp_tm['ppos']==1].copy()
     dcht_trb = dcht_trb.sort_values(['tgid','pcth'], ascending=[True,False]).groupby(['tgid']).head(1)
     dcht_trb['ppos'] = 25
     dcht_trb['ddep'] = 0
     dcht_trb['is_valid'] = True
     dcht_trb = dcht_trb[cols_dcht]
 
-    # final depth chart
-    out = pd.concat([dcht_sort, dcht_k, dcht_p, dcht_krt, dcht_prt, dcht_kos, dcht_los, dcht_trb], axis=0)
-    out.sort_values(['tgid','ppos','ddep'], ascending=[True,True,True], inplace=True)
+    # final depth chart (special teams merged into primary positions order)
+    dcht_st = pd.concat([dcht_k, dcht_p, dcht_krt, dcht_prt, dcht_kos, dcht_los, dcht_trb], axis=0)
+    out = merge_sorted(dcht_sort, dcht_st, ['tgid','ppos','ddep'])
     out = out[cols_dcht_out]
     out.reset_index(inplace=True, drop=True)
 
     return out
 
 
-def get_salary_ref(play):
+def get_team_rating_spec():
     '''
-    create (yearly) salary reference tables by position/rating
+    create spec for team ratings
+
+    - units: starters by position (DCHT depth < n) averaged for unit ratings
+    - groups: unit weights for offense/defense/overall ratings (in calculation order)
+    '''
+
+    units = {
+        'trqb': {0: 1}, # qb
+        'trrb': {1: 1}, # hb
+        'twrr': {3: 2}, # wr
+        'trol': {5: 1, 6: 1, 7: 1, 8: 1, 9: 1}, # lt, lg, c, rg, rt
+        'trdl': {10: 1, 11: 1, 12: 2}, # le, re, dt
+        'trlb': {13: 1, 14: 1, 15: 1}, # lolb, mlb, rolb
+        'trdb': {16: 2, 17: 1, 18: 1}, # cb, fs, ss
+        'trst': {19: 1, 20: 1} # k, p
+    }
+
+    groups = {
+        'trof': {'trqb': 0.35, 'trrb': 0.25, 'twrr': 0.25, 'trol': 0.15},
+        'trde': {'trdl': 0.4, 'trlb': 0.3, 'trdb': 0.3},
+        'trov': {'trof': 0.5, 'trde': 0.4, 'trst': 0.1}
+    }
+
+    return {'units': units, 'groups': groups}
+
+
+def get_team_starters(play, dcht):
+    '''
+    get rostered starters used for team ratings from DCHT with current POVR
+    '''
+
+    spec = get_team_rating_spec()
+    n_start = {p: n for unit in spec['units'].values() for p, n in unit.items()}
+
+    sd = dcht.loc[dcht['tgid'].isin(range(1,33)), ['tgid','ppos','ddep','pgid']]
+    sd = sd.loc[sd['ddep'] < sd['ppos'].map(n_start).fillna(0)]
+    out = sd.merge(play[['pgid','povr']], on='pgid', how='left')
+    out['povr'] = out['povr'].astype('float64')
+    out = sort_table(out, ['tgid','ppos','ddep'])
+    out.reset_index(inplace=True, drop=True)
+
+    return out
+
+
+def get_dirty_teams(starters, starters_upd):
+    '''
+    get teams with changed starters or starter POVR between two starter tables
+    '''
+
+    comp = starters.merge(starters_upd, how='outer', indicator=True)
+
+    return sorted(comp.loc[comp['_merge']!='both', 'tgid'].unique())
+
+
+def get_unit_ratings(starters, tgids):
+    '''
+    get unrounded unit and group ratings by team from starters POVR (weights of missing units excluded)
+    '''
+
+    spec = get_team_rating_spec()
+    ss = starters.loc[starters['tgid'].isin(tgids) & pd.notnull(starters['povr'])].copy()
+    unit_map = {p: unit for unit, pos in spec['units'].items() for p in pos}
+    ss['unit'] = ss['ppos'].map(unit_map)
+    rt = ss.groupby(['tgid','unit'])['povr'].mean().unstack('unit').reindex(columns=list(spec['units'].keys()))
+
+    for col, wts in spec['groups'].items():
+        w = pd.Series(wts)
+        vals = rt[w.index]
+        rt[col] = (vals*w).sum(axis=1, min_count=1) / vals.notnull().mul(w).sum(axis=1)
+
+    return rt
+
+
+def calc_team_ratings(team, starters, tgids=None, base_team=None, base_starters=None):
+    '''
+    calculate team ratings from starters POVR (all teams or selected tgids)
+
+    - unit ratings are mean starter POVR; group ratings are weighted unit ratings
+    - with base_team/base_starters (e.g. imported TEAM and its starters), ratings are the base ratings plus the
+      calculated change from base starters, so unchanged starters reproduce the base ratings exactly
+    - teams/ratings without starters keep current values
+    '''
+
+    st = team.copy()
+    tgids = st.loc[st['tgid'].isin(range(1,33)), 'tgid'].values if tgids is None else tgids
+
+    rt = get_unit_ratings(starters, tgids)
+    if base_team is not None:
+        rt_base = get_unit_ratings(base_starters, tgids).reindex(index=rt.index, columns=rt.columns)
+        bt = base_team.set_index('tgid').reindex(index=rt.index, columns=rt.columns).astype('float64')
+        rt = bt + (rt - rt_base)
+
+    rt = rt.round(0).clip(0, 99)
+
+    # update team rows (missing ratings keep current values)
+    idx = st.loc[st['tgid'].isin(rt.index)].index
+    for col in rt.columns:
+        upd = st.loc[idx, 'tgid'].map(rt[col])
+        st.loc[idx, col] = upd.fillna(st.loc[idx, col]).astype(st[col].dtype)
+
+    return st
+
+
+def get_salary_ref(play, index=None):
+    '''
+    create (yearly) salary reference tables by position/rating (optional cached PLAY index)
     '''
 
     sp = play.copy()
 
     # filter out free agents (zero salary) and create yearly salary fields
-    sp_sal = sp.copy().loc[sp['tgid'].isin(range(1,33))]
+    sp_sal = sp.iloc[get_play_index(sp, index).rostered].copy()
     sp_sal['ptsa_yr'] = sp_sal['ptsa']/sp_sal['pcon']
     sp_sal['psbo_yr'] = sp_sal['psbo']/sp_sal['pcon']
     sp_sal['povr_grp'] = np.floor(sp_sal['povr']/10)
@@ -224,6 +574,14 @@ def get_salary_ref(play):
     sal['psbo_med'] = sal_['psbo_yr'].median().values
     sal['psbo_mu'] = sal_['psbo_yr'].mean().values
 
+    return make_salary_ref(sal)
+
+
+def make_salary_ref(sal):
+    '''
+    create salary reference tables from salary stats by position/rating decile
+    '''
+
     # impute missing ratings deciles
     ppos_ = pd.DataFrame(range(0,21), columns=['ppos'])
     povr_ = pd.DataFrame(np.array(range(0,10)), columns=['povr_grp'])
@@ -248,6 +606,121 @@ def get_salary_ref(play):
     return salref, salmin
 
 
+class SalaryRefCache():
+    '''
+    salary reference tables cached on contracted players' (ppos, povr, ptsa, psbo, pcon)
+
+    - unchanged contracts (same fingerprint) return cached tables
+    - added/removed/changed contracts update per-group sorted salaries instead of regrouping PLAY
+    '''
+
+    cols = ['ppos','povr','ptsa','psbo','pcon']
+
+    def __init__(self, rebuild_frac=0.5):
+
+        self.rebuild_frac = rebuild_frac
+        self.fingerprint = None
+        self.players = None
+        self.hashes = None
+        self.groups = {}
+        self.tables = None
+
+
+    def _get_values(self, rows):
+        '''
+        get group keys and yearly salary/bonus values for contract rows
+        '''
+
+        keys = zip(rows['ppos'].values, np.floor(rows['povr'].values/10))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ptsa_yr = rows['ptsa'].values/rows['pcon'].values
+            psbo_yr = rows['psbo'].values/rows['pcon'].values
+
+        return zip(keys, ptsa_yr, psbo_yr)
+
+
+    def _add(self, rows, sign=1):
+        '''
+        add (sign=1) or remove (sign=-1) contract rows from group stats
+        '''
+
+        for key, ptsa_yr, psbo_yr in self._get_values(rows):
+            if np.isnan(key[1]):
+                continue
+            grp = self.groups.setdefault(key, {'cnt': 0, 'ptsa_yr': [], 'psbo_yr': []})
+            grp['cnt'] += sign
+            for col, val in [('ptsa_yr', ptsa_yr), ('psbo_yr', psbo_yr)]:
+                if np.isnan(val):
+                    continue
+                if sign > 0:
+                    bisect.insort(grp[col], val)
+                else:
+                    del grp[col][bisect.bisect_left(grp[col], val)]
+            if grp['cnt']==0:
+                del self.groups[key]
+
+
+    def _make_tables(self):
+        '''
+        create salary reference tables from group stats
+        '''
+
+        def med(vals):
+            n = len(vals)
+            if n==0:
+                return np.nan
+            return vals[n//2] if n%2 else (vals[n//2-1] + vals[n//2])/2
+
+        def mu(vals):
+            return np.mean(vals) if len(vals)>0 else np.nan
+
+        rows = [[k[0], k[1], g['cnt'], med(g['ptsa_yr']), mu(g['ptsa_yr']), med(g['psbo_yr']), mu(g['psbo_yr'])]
+                for k, g in sorted(self.groups.items())]
+        sal = pd.DataFrame(rows, columns=['ppos','povr_grp','cnt','ptsa_med','ptsa_mu','psbo_med','psbo_mu'])
+        sal['povr_grp'] = sal['povr_grp'].astype('float64')
+
+        return make_salary_ref(sal)
+
+
+    def get(self, play, index=None):
+        '''
+        get (salref, salmin) for PLAY table, updating cached stats for changed contracts
+        '''
+
+        sp_sal = play.iloc[get_play_index(play, index).rostered][['pgid']+self.cols]
+        hashes = pd.Series(pd.util.hash_pandas_object(sp_sal.astype('float64'), index=False).values,
+                           index=sp_sal['pgid'].values)
+        fingerprint = (hashes.shape[0], int(hashes.values.sum()))
+
+        if fingerprint == self.fingerprint:
+            return self.tables[0].copy(), self.tables[1].copy()
+
+        rows = sp_sal.set_index('pgid')
+        unique = rows.index.is_unique
+        if self.players is None or not unique:
+            rebuild = True
+        else:
+            prev = self.hashes
+            same = prev.reindex(hashes.index).values == hashes.values
+            added = hashes.index[~same]
+            removed = prev.index[~prev.index.isin(hashes.index[same])]
+            rebuild = (len(added) + len(removed)) > self.rebuild_frac*max(1, hashes.shape[0])
+
+        if rebuild:
+            self.groups = {}
+            self._add(rows)
+        else:
+            self._add(self.players.loc[removed], sign=-1)
+            self._add(rows.loc[added])
+
+        self.players = rows if unique else None
+        self.hashes = hashes
+        self.fingerprint = fingerprint
+        self.tables = self._make_tables()
+
+        return self.tables[0].copy(), self.tables[1].copy()
+
+
 def update_salary(row, years, sal_ref, sal_min):
     '''
     update player salary using reference tables
@@ -256,7 +729,7 @@ def update_salary(row, years, sal_ref, sal_min):
     # extract data for salary table
     povrg = np.floor(row['povr']/10)
     ppos = row['ppos']
-    pyrp = row['pyrp']
+    pyrp = min(row['pyrp'], sal_min['pyrp'].max())
     pcon, pvco, pcyl = years, years, years
 
     # get salary and bonus reference values
@@ -278,20 +751,23 @@ def update_salary(row, years, sal_ref, sal_min):
     return row
 
 
-def resolve_jersey_dups(play):
+def resolve_jersey_dups(play, index=None):
     '''
-    find and resolve teammates with same jersey number
+    find and resolve teammates with same jersey number (optional cached PLAY index)
     '''
 
     sp = play.copy()
-    sptm = sp.copy().loc[sp['tgid'].isin(range(1,33))]
+    index = get_play_index(sp, index)
+    sptm = sp.iloc[index.rostered].copy()
 
     # get jersey numbers in use by team
-    pjen_map_ = sptm.groupby(['tgid'])['pjen'].unique().reset_index()
-    pjen_map = {i[0]:sorted(int(j) for j in i[1]) for i in pjen_map_.values}
+    pjen = sp['pjen'].values
+    pjen_map = {t: sorted(int(j) for j in pd.unique(pjen[rows])) for t, rows in index.team_rows.items() if t in range(1,33)}
 
     # get dups
     dups_ = is_unique(sptm, ['tgid','pjen'], print_dups=False, return_dups=True)
+    if dups_ is True:
+        return sp
 
     # exclude best player by tgid/pjen (i.e. give them the number)
     cols = ['tgid','pgid','pfna','plna','pjen','ppos','povr']
@@ -323,35 +799,46 @@ def resolve_jersey_dups(play):
     return upd
 
 
-def validate_play_table(play, team, ddplay, rate_calc):
+def validate_play_table(play, team, ddplay, rate_calc, index=None, tgid_maps=None):
     '''
-    validate play data
+    validate play data; returns issues found by check (optional cached PLAY index and team maps)
     '''
 
     sp = play.copy()
     st = team.copy()
     dp = ddplay.copy()
     ppos_map = get_ppos_maps()[0]
-    tgid_map = get_tgid_maps(st)[0]
+    tgid_map = get_tgid_maps(st)[0] if tgid_maps is None else tgid_maps[0]
+    index = get_play_index(sp, index)
 
-    sp_tm = sp.loc[sp['tgid'].isin(range(0,33))]
-    sp_fa = sp.loc[sp['tgid'] == 1009]
+    sp_tm = sp.iloc[index.get_rows(range(0,33))]
+    sp_fa = sp.iloc[index.fa]
     rc = rate_calc.copy()
+    report = {}
 
     # ensure unique player ids
-    is_unique(sp, ['pgid'], print_dups=True)
-    is_unique(sp, ['poid'], print_dups=True)
-
-    # ensure unique name/position
-    is_unique(sp, ['pfna','plna','ppos'], print_dups=True)
+    report['dup_pgid'] = is_unique(sp, ['pgid'], print_dups=True, return_dups=True)
+    report['dup_poid'] = is_unique(sp, ['poid'], print_dups=True, return_dups=True)
+
+    # ensure unique name/position (normalized name codes if available)
+    if 'pnky' in sp.columns:
+        dups = is_unique(sp, ['pnky','ppos'], print_dups=False, return_dups=True)
+        if dups is not True:
+            names = sp[['pnky','ppos','pfna','plna']].drop_duplicates(['pnky','ppos'])
+            dups = dups.merge(names, on=['pnky','ppos'], how='left').set_index(dups.index)[['pfna','plna','ppos','cnt']]
+            print(f"Duplicate PFNA/PLNA/PPOS:\n{dups}\n")
+        report['dup_name'] = dups
+    else:
+        report['dup_name'] = is_unique(sp, ['pfna','plna','ppos'], print_dups=True, return_dups=True)
 
     # ensure unique jersey number by team
-    is_unique(sp_tm, ['tgid','pjen'], print_dups=True)
+    report['dup_pjen'] = is_unique(sp_tm, ['tgid','pjen'], print_dups=True, return_dups=True)
 
     # ensure valid positions
     bad_ppos = sp.loc[~sp['ppos'].isin(range(0,21)) | (~sp['ppos']==sp['pops']), ['pgid','pfna','plna','ppos','pops']]
     if bad_ppos.shape[0] > 0:
         print(f"Invalid POS/PPOS:\n{bad_ppos}\n")
+    report['bad_ppos'] = bad_ppos
 
     # check for missing values
     missing = pd.isnull(sp).sum(axis=0)
@@ -359,6 +846,7 @@ def validate_play_table(play, team, ddplay, rate_calc):
 
     if len(has_miss)>0:
         print(f"Columns with missing values:\n{', '.join([i for i in has_miss])}\n")
+    report['missing'] = has_miss
 
     # ensure valid ranges
     cols_num = sp.select_dtypes([np.number]).columns.values
@@ -372,6 +860,7 @@ def validate_play_table(play, team, ddplay, rate_calc):
 
     if len(bad_range)>0:
         print(f"Columns with invalid range:\n{', '.join([i for i in bad_range])}\n")
+    report['bad_range'] = bad_range
 
     # check obs v. expected ratings
     diff_thresh = 3
@@ -381,6 +870,7 @@ def validate_play_table(play, team, ddplay, rate_calc):
     rate_thresh = sp.copy().loc[sp.povr_diff.abs()>=diff_thresh, cols_rate]
     if rate_thresh.shape[0]>0:
         print(f"Players with absolute value of rating difference (obs-pred) >= {diff_thresh}\n{rate_thresh}:\n")
+    report['povr_diff'] = rate_thresh
 
     # ensure zero salary for free agents
     cols_salary = ['ptsa','pvts','psbo','pvsb','pcon','pvco','pcyl']
@@ -388,9 +878,10 @@ def validate_play_table(play, team, ddplay, rate_calc):
     for col in cols_salary:
         idx_bad_sal += list(sp_fa.loc[sp_fa[col]>0].index)
     idx_bad_sal = list(set(idx_bad_sal))
+    bad_sal_fa = sp_fa.loc[idx_bad_sal, ['pgid','pfna','plna','tgid']+cols_salary]
     if len(idx_bad_sal) > 0:
-        bad_sal_fa = sp_fa.loc[idx_bad_sal, ['pgid','pfna','plna','tgid']+cols_salary]
         print(f"Free Agents with nonzero salary:\n{bad_sal_fa}\n")
+    report['fa_salary'] = bad_sal_fa
 
     # ensure positive salary for rostered players
     cols_salary = ['ptsa','pvts','pcon','pvco']
@@ -398,16 +889,17 @@ def validate_play_table(play, team, ddplay, rate_calc):
     for col in cols_salary:
         idx_bad_sal += list(sp_tm.loc[sp_tm[col]==0].index)
     idx_bad_sal = list(set(idx_bad_sal))
+    bad_sal = sp_tm.loc[idx_bad_sal, ['pgid','pfna','plna','tgid']+cols_salary]
     if len(idx_bad_sal) > 0:
-        bad_sal = sp_tm.loc[idx_bad_sal, ['pgid','pfna','plna','tgid']+cols_salary]
         print(f"Rostered players with zero salary:\n{bad_sal}\n")
+    report['zero_salary'] = bad_sal
 
     # ensure roster depth
     ppos_ = pd.DataFrame(range(0,21), columns=['ppos'])
     tgid_ = pd.DataFrame(range(1,33), columns=['tgid'])
     base_ = tgid_.merge(ppos_, how='cross')
 
-    ppos_cnt_ = sp.groupby(['tgid','ppos']).size().reset_index().rename(columns={0:'cnt'})
+    ppos_cnt_ = pd.Series(index.get_counts(by='team_pos'), dtype='int64').rename_axis(['tgid','ppos']).reset_index(name='cnt')
     ppos_cnt = base_.merge(ppos_cnt_, on=['tgid','ppos'], how='left')
     ppos_cnt['tsna'] = [tgid_map[i] for i in ppos_cnt['tgid']]
     ppos_cnt['pos'] = [ppos_map[i] for i in ppos_cnt['ppos']]
@@ -417,9 +909,11 @@ def validate_play_table(play, team, ddplay, rate_calc):
     ppos_cnt_thresh = ppos_cnt.copy().loc[ppos_cnt['cnt']<1]
     if ppos_cnt_thresh.shape[0]>0:
         print(f"Teams with no players at position:\n{ppos_cnt_thresh}\n")
+    report['empty_ppos'] = ppos_cnt_thresh
 
     # ensure valid roster size
-    roster_size = sp_tm.groupby('tgid').size().reset_index().rename(columns={0:'cnt'})
+    team_cnt = {t: n for t, n in index.get_counts().items() if t in range(0,33)}
+    roster_size = pd.Series(team_cnt, dtype='int64').rename_axis('tgid').reset_index(name='cnt')
     roster_size['abs_diff'] = [abs(53-c) for c in roster_size['cnt']]
     roster_size['tsna'] = [tgid_map[i] for i in roster_size['tgid']]
     
@@ -427,3 +921,7 @@ def validate_play_table(play, team, ddplay, rate_calc):
     roster_size_thresh = roster_size.loc[roster_size['abs_diff']>roster_thresh, ['tgid','tsna','cnt']]
     if roster_size_thresh.shape[0]>0:
         print(f"Teams under/over roster limit (53) by {roster_thresh+1}+ players:\n{roster_size_thresh}\n")
+    report['roster_size'] = roster_size_thresh
+
+    return report
+
@@ -10,10 +10,99 @@ import warnings
 
 warnings.filterwarnings('ignore')
 
-from utils import coalesce, to_numeric, format_data
+from utils import coalesce, to_numeric, format_data, sort_table, merge_sorted
+from instrument import instrument_stage, log_changes, get_save_tables, export_stage_log
+from change_log import ChangeLog
+from scenarios import run_scenarios
+from roster_balancer import balance_rosters
+from progression import simulate_seasons, to_play
+from ratings_rules import load_rules, apply_rules
 
 from save_tools import get_ppos_maps, get_tgid_maps, find_player, predict_povr, predict_pimp, \
-                        update_dcht, get_salary_ref, update_salary, resolve_jersey_dups, validate_play_table
+                        update_dcht, update_salary, resolve_jersey_dups, validate_play_table, \
+                        SalaryRefCache, read_calc, get_team_starters, get_dirty_teams, calc_team_ratings, \
+                        get_play_index, NameCodes
+
+
+def load_saves(config):
+    '''
+    load and format save tables and data dicts from config
+    '''
+
+    # set load paths from config
+    dd_path = f"{config['setup']['dir']}/{config['setup']['data_dict']}"
+    save_dir = config['saves']['dir']
+    save_name = config['saves']['import']
+
+    # load and process data
+    saves = {
+        'play': {'sv': None, 'dd': None, 'cols_sort': ['tgid','ppos','pgid']},
+        'team': {'sv': None, 'dd': None, 'cols_sort': ['tgid']},
+        'dcht': {'sv': None, 'dd': None, 'cols_sort': ['tgid','ppos','ddep']},
+        'injy': {'sv': None, 'dd': None, 'cols_sort': ['tgid','pgid']}
+    }
+
+    for key in saves.keys():
+        dd = pd.read_excel(dd_path, sheet_name=key.upper())
+        sv = pd.read_csv(f"{save_dir}/{save_name}/{save_name}_{key.upper()}.csv")
+        cols_out = dd.sort_values(by='view_id', ascending=True)['column'].str.lower().values
+        cols_sort = saves[key]['cols_sort']
+        sv = sort_table(format_data(sv)[cols_out], cols_sort)
+        sv.reset_index(inplace=True, drop=True)
+        saves[key]['dd'] = dd
+        saves[key]['sv'] = sv
+
+    return saves
+
+
+def load_calcs(config):
+    '''
+    load ratings calculators from config (.npz archives or legacy pickles)
+    '''
+
+    calcs = {}
+    calc_dir = config['setup']['dir']
+    for key in ['povr_calc','pimp_calc']:
+        calc_path = f"{calc_dir}/{config['setup'][key]}"
+        if calc_path.endswith('.npz'):
+            calcs[key] = read_calc(calc_path)
+        else:
+            with open(calc_path, 'rb') as file:
+                calcs[key] = pickle.load(file)
+
+    return calcs
+
+
+def load_artifacts(config):
+    '''
+    load artifacts that can be shared across Save instances (data dicts, save tables, calculators)
+    '''
+
+    return {'saves': load_saves(config), 'calcs': load_calcs(config)}
+
+
+# update pipeline stages and Save methods, in execution order
+save_stages = {
+    'base': 'run_base_updates',
+    'tx': 'run_tx_execute',
+    'ratings': 'update_ratings_custom',
+    'rules': 'apply_ratings_rules',
+    'salaries': 'update_salaries',
+    'dcht': 'reorder_dcht',
+    'team': 'update_team_ratings',
+    'pimp': 'update_pimp',
+    'jersey': 'resolve_jersey_duplicates'
+}
+
+# update files (config->updates keys) and the stages that consume them
+update_stages = {
+    'miss': 'base',
+    'caps': 'base',
+    'drop': 'base',
+    'txss': 'tx',
+    'rate': 'ratings',
+    'rules': 'rules'
+}
 
 
 class Save():
@@ -23,12 +112,17 @@ class Save():
 
     global coalesce, to_numeric, format_data
     global get_ppos_maps, get_tgid_maps, find_player, predict_povr, predict_pimp, \
-            update_dcht, get_salary_ref, update_salary, resolve_jersey_dups, validate_play_table
+            update_dcht, update_salary, resolve_jersey_dups, validate_play_table
 
 
-    def __init__(self, config):
+    def __init__(self, config, artifacts=None, instrument=False, track_changes=False):
         
         self.config = config
+        self.artifacts = artifacts
+        self.instrument = instrument
+        self.track_changes = track_changes
+        self.stage_log = []
+        self.stage_callbacks = []
         self._init_data()
         self._init_tools()
 
@@ -44,76 +138,98 @@ class Save():
         '''
 
         '''saves and data dicts'''
-        # set load paths from config
         config = self.config
-        dd_path = f"{config['setup']['dir']}/{config['setup']['data_dict']}"
-        save_dir = config['saves']['dir']
-        save_name = config['saves']['import']
-
-        # load and process data
-        saves = {
-            'play': {'sv': None, 'dd': None, 'cols_sort': ['tgid','ppos','pgid']},
-            'team': {'sv': None, 'dd': None, 'cols_sort': ['tgid']},
-            'dcht': {'sv': None, 'dd': None, 'cols_sort': ['tgid','ppos','ddep']},
-            'injy': {'sv': None, 'dd': None, 'cols_sort': ['tgid','pgid']}
-        }
-
-        for key in saves.keys():
-            dd = pd.read_excel(dd_path, sheet_name=key.upper())
-            sv = pd.read_csv(f"{save_dir}/{save_name}/{save_name}_{key.upper()}.csv")
-            cols_out = dd.sort_values(by='view_id', ascending=True)['column'].str.lower().values
-            cols_sort = saves[key]['cols_sort']
-            sv = format_data(sv)[cols_out]
-            sv.sort_values(cols_sort, inplace=True)
-            sv.reset_index(inplace=True, drop=True)
-            saves[key]['dd'] = dd
-            saves[key]['sv'] = sv
-
-        # save data to instance objects
-        self.sv_play = saves['play']['sv']
-        self.dd_play = saves['play']['dd']
-        self.sv_team = saves['team']['sv']
-        self.dd_team = saves['team']['dd']
-        self.sv_dcht = saves['dcht']['sv']
-        self.dd_dcht = saves['dcht']['dd']
-        self.sv_injy = saves['injy']['sv']
-        self.dd_injy = saves['injy']['dd']
+        if self.artifacts is None:
+            saves = load_saves(config)
+        else:
+            saves = self.artifacts['saves']
+
+        # save data to instance objects (copies keep shared artifacts intact)
+        self.sv_play = saves['play']['sv'].copy()
+        self.dd_play = saves['play']['dd'].copy()
+        self.sv_team = saves['team']['sv'].copy()
+        self.dd_team = saves['team']['dd'].copy()
+        self.sv_dcht = saves['dcht']['sv'].copy()
+        self.dd_dcht = saves['dcht']['dd'].copy()
+        self.sv_injy = saves['injy']['sv'].copy()
+        self.dd_injy = saves['injy']['dd'].copy()
+
+        # interned name key codes on PLAY (pnky/plky; not exported)
+        self.name_codes = NameCodes()
+        self.sv_play = self.name_codes.add_keys(self.sv_play)
+
+        # change log of stage writes (spilled to config->saves->changes directory, if set)
+        spill_dir = config['saves'].get('changes')
+        self.change_log = ChangeLog(spill_dir=spill_dir) if self.track_changes else None
+
+        # starters used for current team ratings (teams are recalculated when starters change); imported
+        # TEAM ratings and starters are the base for calculated rating changes
+        self.team_starters = get_team_starters(self.sv_play, self.sv_dcht)
+        self.team_base = self.sv_team.copy()
+        self.team_starters_base = self.team_starters.copy()
 
         '''updates'''
+        self._init_updates()
+
+
+    def _init_updates(self, keys=None):
+        '''
+        load update data from config (all update files or selected keys)
+        '''
+
+        config = self.config
         upd_dir = config['updates']['dir']
+        if keys is None:
+            keys = list(update_stages.keys())
 
+        # update files are optional (unset files are None; their updates are skipped)
         # missing bios
-        miss_path_ = config['updates']['miss']
-        if miss_path_:
-            miss_path = f"{upd_dir}/{miss_path_}"
-            self.upd_miss = format_data(pd.read_csv(miss_path))
+        miss_path_ = config['updates'].get('miss')
+        if 'miss' in keys:
+            self.upd_miss = None
+            if miss_path_:
+                miss_path = f"{upd_dir}/{miss_path_}"
+                self.upd_miss = format_data(pd.read_csv(miss_path))
 
         # cap additions
-        caps_path_ = config['updates']['caps']
-        if caps_path_:
-            caps_path = f"{upd_dir}/{caps_path_}"
-            self.upd_caps = format_data(pd.read_csv(caps_path))
+        caps_path_ = config['updates'].get('caps')
+        if 'caps' in keys:
+            self.upd_caps = None
+            if caps_path_:
+                caps_path = f"{upd_dir}/{caps_path_}"
+                self.upd_caps = format_data(pd.read_csv(caps_path))
 
         # player deletions
-        drop_path_ = config['updates']['drop']
-        if drop_path_:
-            drop_path = f"{upd_dir}/{drop_path_}"
-            self.upd_drop = format_data(pd.read_csv(drop_path))
+        drop_path_ = config['updates'].get('drop')
+        if 'drop' in keys:
+            self.upd_drop = None
+            if drop_path_:
+                drop_path = f"{upd_dir}/{drop_path_}"
+                self.upd_drop = format_data(pd.read_csv(drop_path))
 
         # transactions
-        txss_path_ = config['updates']['txss']
-        if txss_path_:
-            txss_path = f"{upd_dir}/{txss_path_}"
-            upd_tx = format_data(pd.read_csv(txss_path))
-            upd_tx['date'] = pd.to_datetime(upd_tx['date'], format='%Y-%m-%d')
-            self.upd_tx = upd_tx.copy()
+        txss_path_ = config['updates'].get('txss')
+        if 'txss' in keys:
+            self.upd_tx = None
+            if txss_path_:
+                txss_path = f"{upd_dir}/{txss_path_}"
+                upd_tx = format_data(pd.read_csv(txss_path))
+                upd_tx['date'] = pd.to_datetime(upd_tx['date'], format='%Y-%m-%d')
+                self.upd_tx = upd_tx.copy()
 
         # ratings updates
-        rate_path_ = config['updates']['rate']
-        if rate_path_:
-            rate_path = f"{upd_dir}/{rate_path_}"
-            upd_rate = format_data(pd.read_csv(rate_path))
-            self.upd_rate = upd_rate.copy()
+        rate_path_ = config['updates'].get('rate')
+        if 'rate' in keys:
+            self.upd_rate = None
+            if rate_path_:
+                rate_path = f"{upd_dir}/{rate_path_}"
+                upd_rate = format_data(pd.read_csv(rate_path))
+                self.upd_rate = upd_rate.copy()
+
+        # batch ratings rules (optional)
+        rules_path_ = config['updates'].get('rules')
+        if 'rules' in keys:
+            self.upd_rules = load_rules(f"{upd_dir}/{rules_path_}") if rules_path_ else []
 
 
     def _init_tools(self):
@@ -126,20 +242,21 @@ class Save():
         # position map
         self.ppos_maps = get_ppos_maps()
 
-        # team map
-        self.tgid_maps = get_tgid_maps(self.sv_team)
+        # team map and PLAY group indexes (cached; rebuilt when key columns change)
+        self.team_keys = None
+        self.play_index = None
+        self.get_team_maps()
 
-        # povr ratings calculator
-        povr_calc_d = config['setup']['dir']
-        povr_calc_f = config['setup']['povr_calc']
-        with open(f"{povr_calc_d}/{povr_calc_f}", 'rb') as file:
-            self.povr_calc = pickle.load(file)
+        # salary reference tables (cached on contracted players)
+        self.salary_ref = SalaryRefCache()
 
-        # pimp ratings calculator
-        pimp_calc_d = config['setup']['dir']
-        pimp_calc_f = config['setup']['pimp_calc']
-        with open(f"{pimp_calc_d}/{pimp_calc_f}", 'rb') as file:
-            self.pimp_calc = pickle.load(file)
+        # ratings calculators
+        if self.artifacts is None:
+            calcs = load_calcs(config)
+        else:
+            calcs = self.artifacts['calcs']
+        self.povr_calc = calcs['povr_calc']
+        self.pimp_calc = calcs['pimp_calc']
 
 
     def search_player(self, name, cols=None):
@@ -147,9 +264,34 @@ class Save():
         player name search (wrapper)
         '''
 
-        return find_player(name, self.sv_play, self.sv_team, cols=cols)
+        return find_player(name, self.sv_play, self.sv_team, cols=cols, tgid_maps=self.get_team_maps(),
+                           name_codes=self.name_codes)
+
+
+    def get_play_index(self):
+        '''
+        get cached PLAY group indexes (rebuilt when pgid/tgid/ppos change)
+        '''
+
+        self.play_index = get_play_index(self.sv_play, self.play_index)
+
+        return self.play_index
+
+
+    def get_team_maps(self):
+        '''
+        get cached team id dicts (rebuilt when TEAM tgid/tsna change)
+        '''
+
+        keys = self.sv_team[['tgid','tsna']]
+        if self.team_keys is None or not keys.equals(self.team_keys):
+            self.team_keys = keys.copy()
+            self.tgid_maps = get_tgid_maps(keys)
+
+        return self.tgid_maps
 
 
+    @log_changes('base_miss')
     def _update_missing_bios(self, play=None, write=False):
         '''
         update missing bios for default players
@@ -160,20 +302,23 @@ class Save():
             sp = self.sv_play.copy()
         else:
             sp = play.copy()
-        st = self.sv_team.copy()
+        sp = self.name_codes.add_keys(sp) if 'pnky' not in sp.columns else sp
         su = self.upd_miss.copy()
-        team_map = get_tgid_maps(st)[1]
+        team_map = self.get_team_maps()[1]
 
-        # join play and update data
+        # join play and update data (normalized name codes)
         su['tgid'] = list(map(lambda x: team_map[x], su['tsna']))
-        out = sp.merge(su, on=['tgid','pfna','plna'], how='left')
+        su['pnky'] = self.name_codes.encode_names(su['pfna'].values, su['plna'].values, add=False)[0]
+        su = su.loc[su['pnky']>=0].drop(columns=['pfna','plna'])
+        out = sp.merge(su, on=['tgid','pnky'], how='left')
         cols_upd = ['pfna_upd','plna_upd'] #,'pjen_upd']
         col_pairs = [[cu.split('_')[0], cu] for cu in cols_upd]
 
-        # coalesce columns
+        # coalesce columns and update name codes for renamed players
+        renamed = pd.notnull(out[cols_upd]).any(axis=1).values
         for cp in col_pairs:
             out[cp[0]] = coalesce(out, cp[1], cp[0], impute=np.nan)
-        out = out[sp.columns]
+        out = self.name_codes.add_keys(out[sp.columns], rows=renamed)
 
         if write:
             self.sv_play = out.copy()
@@ -181,7 +326,8 @@ class Save():
             return out
         
 
-    def _add_caps(self, play, write=False):
+    @log_changes('base_caps')
+    def _add_caps(self, play=None, write=False):
         '''
         add CAPS to play data
         '''
@@ -192,14 +338,17 @@ class Save():
             sp = play.copy()
         uc = self.upd_caps.copy()
 
+        # name codes for new players
+        if 'pnky' in sp.columns:
+            uc = self.name_codes.add_keys(uc)
+
         # ensure same data frame columns
         cols_same = all(sp.columns == uc.columns)
         if not cols_same:
             raise Exception("Data frames do not have the same columns")
         
-        # merge and update
-        out = pd.concat([sp, uc], axis=0)
-        out.sort_values(['tgid','ppos','pgid'], inplace=True)
+        # merge sorted caps into PLAY order
+        out = merge_sorted(sp, uc, ['tgid','ppos','pgid'])
         out.reset_index(inplace=True, drop=True)
 
         if write:
@@ -208,7 +357,8 @@ class Save():
             return out
 
 
-    def _drop_players(self, play, write=True):
+    @log_changes('base_drop')
+    def _drop_players(self, play=None, write=True):
         '''
         delete players from game
         '''
@@ -217,12 +367,11 @@ class Save():
             sp = self.sv_play.copy()
         else:
             sp = play.copy()
+        sp = self.name_codes.add_keys(sp) if 'pnky' not in sp.columns else sp
         drop = self.upd_drop.copy()
         drop['delete'] = 1
-        out = sp.merge(drop,
-                       left_on=['pgid', sp['pfna'].str.lower(), sp['plna'].str.lower().str.strip()],
-                       right_on=['pgid', drop['pfna'].str.lower(), drop['plna'].str.lower().str.strip()],
-                       how='left')
+        drop['pnky'] = self.name_codes.encode_names(drop['pfna'].values, drop['plna'].values, add=False)[0]
+        out = sp[['pgid','pnky']].merge(drop[['pgid','pnky','delete']], on=['pgid','pnky'], how='left')
         idx_drop = out.loc[out['delete']==1].index
         sp.drop(index=idx_drop, inplace=True)
 
@@ -232,6 +381,7 @@ class Save():
             return sp
         
 
+    @log_changes('base_injy')
     def _remove_injuries(self, write=False):
         '''
         remove preexisting injuries, if any
@@ -246,6 +396,7 @@ class Save():
             return si
 
 
+    @instrument_stage('base')
     def run_base_updates(self, write=False):
         '''
         apply inital updates for PLAY, INJY tables
@@ -254,13 +405,13 @@ class Save():
         sp = self.sv_play.copy()
         si = self.sv_injy.copy()
 
-        # PLAY updates
+        # PLAY updates (skipped for unset update files)
         # update missing bios
-        bio = self._update_missing_bios(sp, write=False)
+        bio = self._update_missing_bios(sp, write=False) if self.upd_miss is not None else sp
         # add caps
-        caps = self._add_caps(bio, write=False)
+        caps = self._add_caps(bio, write=False) if self.upd_caps is not None else bio
         # delete players from game
-        out = self._drop_players(caps, write=False)
+        out = self._drop_players(caps, write=False) if self.upd_drop is not None else caps
 
         # INJY updates
         # remove injuries
@@ -273,29 +424,35 @@ class Save():
             return out
 
 
+    @instrument_stage('ratings')
     def update_ratings_custom(self, write=False):
         '''
         apply custom player ratings updates from external data
         '''
 
         sp = self.sv_play.copy()
-        ur = self.upd_rate.copy()
         dp = self.dd_play.copy()
 
-        # merge new ratings
-        rate = sp.merge(ur, on='pgid', how='left', suffixes=[None, '_upd'])
+        # ratings updates file is optional (unchanged if unset)
+        if self.upd_rate is None:
+            rate = sp
+        else:
+            ur = self.upd_rate.copy()
 
-        cols_attr = dp.loc[dp['category'].str.lower()=='attributes', 'column'].str.lower().values
-        cols_sp = dp['column'].str.lower().values
+            # merge new ratings
+            rate = sp.merge(ur, on='pgid', how='left', suffixes=[None, '_upd'])
 
-        # coalesce ratings
-        for col in cols_attr:
-            rate[col] = coalesce(rate, col+'_upd', col, impute=np.nan)
+            cols_attr = dp.loc[dp['category'].str.lower()=='attributes', 'column'].str.lower().values
+            cols_sp = dp['column'].str.lower().values
 
-        rate = rate[cols_sp]
+            # coalesce ratings
+            for col in cols_attr:
+                rate[col] = coalesce(rate, col+'_upd', col, impute=np.nan)
 
-        # update overall
-        rate['povr'] = rate.apply(predict_povr, calc_map=self.povr_calc, axis=1)
+            rate = rate[list(cols_sp) + [c for c in sp.columns if c not in cols_sp]]
+
+            # update overall
+            rate['povr'] = rate.apply(predict_povr, calc_map=self.povr_calc, axis=1)
 
         if write:
             self.sv_play = rate.copy()
@@ -303,30 +460,55 @@ class Save():
             return rate
 
 
-    def run_tx_execute(self, write=False):
+    @instrument_stage('rules')
+    def apply_ratings_rules(self, write=False, rules=None):
         '''
-        execute finalized tx on play data
+        apply batch ratings rules (default: config rules file) and rescore POVR; summary by rule in rules_summary
         '''
-        
+
         sp = self.sv_play.copy()
-        txfn = self.upd_tx.copy()
+        rules = self.upd_rules if rules is None else rules
+
+        out, self.rules_summary = apply_rules(sp, self.dd_play, self.povr_calc, rules)
 
-        # merge play and tx data
-        cols_tx = ['pgid','tx','tgid_fr','tgid_to']
-        sp_tx = sp.merge(txfn[cols_tx], on='pgid', how='left')
+        if write:
+            self.sv_play = out.copy()
+        else:
+            return out
 
-        # update team id
-        sp_tx['tgid'] = coalesce(sp_tx, 'tgid_to','tgid', impute=np.nan)
-        sp_tx['ppti'] = coalesce(sp_tx, 'tgid_fr','tgid', impute=np.nan)
 
-        # update years with team
-        to_fa = ['release','waive','practice','retire']
-        to_tgid = ['sign','resign','trade']
-        sp_tx.loc[sp_tx['tx'].isin(to_fa), 'pywt'] = 31
-        sp_tx.loc[sp_tx['tx'].isin(to_tgid + ['trade']), 'pywt'] = 0
+    @instrument_stage('tx')
+    def run_tx_execute(self, write=False, tx=None):
+        '''
+        execute finalized tx on play data (default: config tx file; or tx table in PLAY_TXS_UPD format)
+        '''
+        
+        sp = self.sv_play.copy()
+        txfn = self.upd_tx if tx is None else tx
 
-        # output
-        sp_tx.drop(columns=cols_tx[1:], inplace=True)
+        # tx file is optional (unchanged if unset)
+        if txfn is None:
+            sp_tx = sp
+        else:
+            # merge play and tx data
+            cols_tx = ['pgid','tx','tgid_fr','tgid_to']
+            sp_tx = sp.merge(txfn[cols_tx], on='pgid', how='left')
+
+            # update team id
+            sp_tx['tgid'] = coalesce(sp_tx, 'tgid_to','tgid', impute=np.nan)
+            sp_tx['ppti'] = coalesce(sp_tx, 'tgid_fr','tgid', impute=np.nan)
+
+            # update years with team
+            to_fa = ['release','waive','practice','retire']
+            to_tgid = ['sign','resign','trade']
+            sp_tx.loc[sp_tx['tx'].isin(to_fa), 'pywt'] = 31
+            sp_tx.loc[sp_tx['tx'].isin(to_tgid + ['trade']), 'pywt'] = 0
+
+            # output (players with tx are merged back into PLAY order)
+            moved = sp_tx['tx'].notnull()
+            sp_tx = merge_sorted(sp_tx.loc[~moved], sp_tx.loc[moved], ['tgid','ppos','pgid'])
+            sp_tx.drop(columns=cols_tx[1:], inplace=True)
+            sp_tx.reset_index(inplace=True, drop=True)
 
         if write:
             self.sv_play = sp_tx.copy()
@@ -334,6 +516,7 @@ class Save():
             return sp_tx
 
 
+    @instrument_stage('salaries')
     def update_salaries(self, write=False):
         '''
         update salaries (wrapper)
@@ -342,12 +525,15 @@ class Save():
         sp = self.sv_play.copy()
         cols_salary = ['ptsa','pvts','psbo','pvsb','pcon','pvco','pcyl']        
 
+        index = self.get_play_index()
+
         # zero out free agent contracts
-        sp.loc[sp['tgid']==1009, cols_salary] = 0
+        sp.iloc[index.fa, [sp.columns.get_loc(c) for c in cols_salary]] = 0
 
         # generate salary for rostered players without contracts
-        salref, salmin = get_salary_ref(sp)
-        idx_nosal = sp.loc[(sp['tgid'].isin(range(1,33))) & (sp['ptsa']==0)].index
+        salref, salmin = self.salary_ref.get(sp, index=index)
+        sp_tm = sp.iloc[index.rostered]
+        idx_nosal = sp_tm.loc[sp_tm['ptsa']==0].index
         sp.loc[idx_nosal, :] = sp.loc[idx_nosal].apply(update_salary, years=3, sal_ref=salref, sal_min=salmin, axis=1)
 
         if write:
@@ -356,13 +542,14 @@ class Save():
             return sp
 
 
+    @instrument_stage('dcht', table='dcht')
     def reorder_dcht(self, write=False):
         '''
         reorder depth charts (wrapper)
         '''
 
         sp = self.sv_play.copy()
-        sd = update_dcht(sp)
+        sd = update_dcht(sp, index=self.get_play_index())
 
         if write:
             self.sv_dcht = sd.copy()
@@ -370,6 +557,25 @@ class Save():
             return sd
 
 
+    @instrument_stage('team', table='team')
+    def update_team_ratings(self, write=False):
+        '''
+        update team ratings for teams with changed starters or starter POVR (change vs. imported ratings; wrapper)
+        '''
+
+        starters = get_team_starters(self.sv_play, self.sv_dcht)
+        tgids = get_dirty_teams(self.team_starters, starters)
+        st = calc_team_ratings(self.sv_team, starters, tgids=tgids, base_team=self.team_base,
+                               base_starters=self.team_starters_base)
+
+        if write:
+            self.sv_team = st.copy()
+            self.team_starters = starters.copy()
+        else:
+            return st
+
+
+    @instrument_stage('pimp')
     def update_pimp(self, write=False):
         '''
         update player importance (wrapper)
@@ -389,13 +595,14 @@ class Save():
             return imp
 
 
+    @instrument_stage('jersey')
     def resolve_jersey_duplicates(self, write=False):
         '''
         handle duplicate jersey numbers (wrapper)
         '''
 
         sp = self.sv_play.copy()
-        upd = resolve_jersey_dups(sp)
+        upd = resolve_jersey_dups(sp, index=self.get_play_index())
 
         if write:
             self.sv_play = upd.copy()
@@ -403,6 +610,119 @@ class Save():
             return upd
 
 
+    def add_stage_callback(self, callback):
+        '''
+        register function called with each stage record
+        '''
+
+        self.stage_callbacks.append(callback)
+
+
+    def get_stage_log(self):
+        '''
+        get stage records as data frame
+        '''
+
+        return pd.DataFrame(self.stage_log)
+
+
+    def export_stage_log(self, path, append=False):
+        '''
+        export stage records as JSON lines
+        '''
+
+        export_stage_log(self.stage_log, path, append=append)
+
+
+    def get_changes(self, pgid=None, stage=None, column=None, table='play'):
+        '''
+        query change log records (wrapper; pgid is TGID for TEAM)
+        '''
+
+        if self.change_log is None:
+            raise Exception("Change tracking is off: Save(track_changes=True)")
+
+        return self.change_log.get_changes(key=pgid, stage=stage, column=column, table=table)
+
+
+    def undo_stage(self, stage=None):
+        '''
+        undo latest stage write (or writes back to latest write of stage) from change log
+        '''
+
+        if self.change_log is None:
+            raise Exception("Change tracking is off: Save(track_changes=True)")
+
+        tables = get_save_tables(self)
+        out, seqs = self.change_log.undo(tables, stage=stage)
+        for table, data in out.items():
+            setattr(self, f"sv_{table}", data)
+        # team ratings no longer match cached starters: recalculate all teams on next team stage
+        if (self.change_log.get_changes(seq=seqs, table='team').shape[0]) > 0:
+            self.team_starters = self.team_starters.iloc[0:0]
+
+        return seqs
+
+
+    def restore_tables(self, tables, stage='restore'):
+        '''
+        replace save data (dict of attribute -> data frame, e.g. checkpoint); table writes are recorded in change log
+        '''
+
+        before = get_save_tables(self)
+        for attr, data in tables.items():
+            setattr(self, attr, data.copy())
+        if self.change_log is not None:
+            self.change_log.record(stage, before, get_save_tables(self))
+
+
+    def run_stages(self, stages=None):
+        '''
+        run update pipeline stages in order and write results
+        '''
+
+        if stages is None:
+            stages = list(save_stages.keys())
+        bad = [s for s in stages if s not in save_stages]
+        if len(bad)>0:
+            raise Exception(f"Unknown stages: {', '.join(bad)}")
+
+        for stage, method in save_stages.items():
+            if stage in stages:
+                getattr(self, method)(write=True)
+
+
+    def run_ratings_scenarios(self, scenarios, chunk=64):
+        '''
+        evaluate batched ratings scenarios on current PLAY data (wrapper)
+        '''
+
+        return run_scenarios(self.sv_play, self.dd_play, self.povr_calc, self.pimp_calc, scenarios, chunk=chunk)
+
+
+    def balance_rosters(self, limit=53):
+        '''
+        create roster balancing transactions for current PLAY data (wrapper; execute with run_tx_execute(tx=...))
+        '''
+
+        return balance_rosters(self.sv_play, self.sv_team, limit=limit)
+
+
+    @instrument_stage('progression')
+    def advance_seasons(self, seasons=1, seed=0, write=False):
+        '''
+        advance players by seasons of aging and progression (wrapper)
+        '''
+
+        state, _ = simulate_seasons(self.sv_play, self.dd_play, self.povr_calc, seasons=seasons, seed=seed)
+        sp = to_play(self.sv_play, state)
+
+        if write:
+            self.sv_play = sp.copy()
+        else:
+            return sp
+
+
     def validate_play(self, play=None, team=None, ddplay=None):
         '''
         validate play data (wrapper)
@@ -412,7 +732,9 @@ class Save():
         st = self.sv_team.copy() if team is None else team.copy()
         dp = self.dd_play.copy() if ddplay is None else ddplay.copy()
         rc = self.povr_calc.copy()
-        validate_play_table(sp, st, dp, rc)
+        index = self.get_play_index() if play is None else None
+        tgid_maps = self.get_team_maps() if team is None else None
+        return validate_play_table(sp, st, dp, rc, index=index, tgid_maps=tgid_maps)
         
 
     def export_tables(self):
@@ -431,26 +753,22 @@ class Save():
         if not os.path.exists(path_export):
             os.mkdir(path_export)
 
-        # restore original columns and data types
+        # restore original columns and data types (sorts are skipped for tables already in export order)
         cols_play = list(self.dd_play['column'].values)
         cols_team = list(self.dd_team['column'].values)
         cols_dcht = list(self.dd_dcht['column'].values)
         cols_injy = list(self.dd_injy['column'].values)
 
-        sp = to_numeric(self.sv_play.copy(), dtype='integer')[[col.lower() for col in cols_play]]
-        sp.sort_values(['tgid','ppos','pgid'], inplace=True)
+        sp = sort_table(to_numeric(self.sv_play.copy(), dtype='integer')[[col.lower() for col in cols_play]], ['tgid','ppos','pgid'])
         sp.columns = cols_play
 
-        st = to_numeric(self.sv_team.copy(), dtype='integer')[[col.lower() for col in cols_team]]
-        st.sort_values(['tgid'], inplace=True)
+        st = sort_table(to_numeric(self.sv_team.copy(), dtype='integer')[[col.lower() for col in cols_team]], ['tgid'])
         st.columns = cols_team
 
-        sd = to_numeric(self.sv_dcht.copy(), dtype='integer')[[col.lower() for col in cols_dcht]]
-        sd.sort_values(['tgid','ppos','ddep'], inplace=True)
+        sd = sort_table(to_numeric(self.sv_dcht.copy(), dtype='integer')[[col.lower() for col in cols_dcht]], ['tgid','ppos','ddep'])
         sd.columns = cols_dcht
 
-        si = to_numeric(self.sv_injy.copy(), dtype='integer')[[col.lower() for col in cols_injy]]
-        si.sort_values(['tgid','pgid'], inplace=True)
+        si = sort_table(to_numeric(self.sv_injy.copy(), dtype='integer')[[col.lower() for col in cols_injy]], ['tgid','pgid'])
         si.columns = cols_injy
 
         # write to csv
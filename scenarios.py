@@ -0,0 +1,238 @@
+"""
+Batched what-if scenarios for ratings changes
+
+- each scenario combines absolute ratings updates (PLAY_RATE_UPD format) and/or query-based adjustments
+  (e.g. {'query': 'pyrp == 0', 'add': {'pspd': 3}} for +3 speed to all rookies)
+- scenarios are stacked into (scenario x player x attribute) arrays; POVR, depth order and PIMP are
+  computed for all scenarios at once without copying or updating the save
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils import format_data
+from save_tools import get_ppos_maps, get_ddep_max
+
+
+def get_attr_cols(ddplay):
+    '''
+    get ratings attribute columns that can be changed by scenarios (POVR/PIMP are derived)
+    '''
+
+    dp = ddplay.copy()
+    cols = dp.loc[dp['category'].str.lower()=='attributes', 'column'].str.lower()
+
+    return [c for c in cols if c not in ['povr','pimp']]
+
+
+def load_rate_scenarios(paths):
+    '''
+    create scenarios from ratings update files (PLAY_RATE_UPD format), one scenario per file
+    '''
+
+    return [{'name': path, 'rate': format_data(pd.read_csv(path))} for path in paths]
+
+
+def get_query_columns(play):
+    '''
+    get PLAY columns (and position names as pos) as query variables
+
+    - queries are evaluated with pd.eval(query, local_dict=cols); DataFrame.eval would rebuild column
+      resolvers for every query
+    '''
+
+    cols = {c: play[c] for c in play.columns}
+    cols['pos'] = play['ppos'].map(get_ppos_maps()[0])
+
+    return cols
+
+
+def eval_query(expr, cols, dtype):
+    '''
+    evaluate query/expression on query variables as array of PLAY length
+    '''
+
+    n = cols['pgid'].shape[0]
+
+    return np.broadcast_to(np.asarray(pd.eval(expr, local_dict=cols), dtype=dtype), (n,))
+
+
+def get_query_masks(play, scenarios):
+    '''
+    evaluate each distinct adjustment query once on PLAY table (position names available as pos)
+    '''
+
+    cols = get_query_columns(play)
+    queries = set(adj['query'] for scn in scenarios for adj in scn.get('adjust', []) if adj.get('query'))
+
+    return {q: eval_query(q, cols, bool) for q in queries}
+
+
+def stack_scenarios(play, scenarios, cols_attr, masks):
+    '''
+    create (scenario x player x attribute) array with scenario updates applied
+    '''
+
+    sp = play
+    base = sp[cols_attr].values.astype('float64')
+    stack = np.repeat(base[None,:,:], len(scenarios), axis=0)
+    col_idx = {c: i for i, c in enumerate(cols_attr)}
+    row_idx = pd.Series(np.arange(sp.shape[0]), index=sp['pgid'].values)
+
+    for s, scn in enumerate(scenarios):
+        # absolute values by player (missing values are not updated)
+        rate = scn.get('rate')
+        if rate is not None:
+            rate = rate.loc[rate['pgid'].isin(row_idx.index)]
+            rows = row_idx[rate['pgid'].values].values
+            for col in [c for c in rate.columns if c in col_idx]:
+                vals = rate[col].values.astype('float64')
+                has_val = ~np.isnan(vals)
+                stack[s, rows[has_val], col_idx[col]] = vals[has_val]
+
+        # query-based adjustments (add/set), masks evaluated on current PLAY
+        for adj in scn.get('adjust', []):
+            mask = masks[adj['query']] if adj.get('query') else np.ones(sp.shape[0], dtype=bool)
+            for col, val in adj.get('add', {}).items():
+                stack[s, mask, col_idx[col]] += val
+            for col, val in adj.get('set', {}).items():
+                stack[s, mask, col_idx[col]] = val
+
+    return np.clip(stack, 0, 99)
+
+
+def predict_povr_stack(play, stack, cols_attr, calc_map):
+    '''
+    get POVR predictions for stacked scenarios (players without a position formula keep current POVR)
+    '''
+
+    sp = play
+    n_scn, n_ply = stack.shape[:2]
+    xvars = [i for i in next(iter(calc_map.values()))['coef_imp'].index if i != 'Intercept']
+
+    # per-player coefficients from position formulas
+    coef = np.zeros((n_ply, len(xvars)))
+    icpt = np.full(n_ply, np.nan)
+    ppos = sp['ppos'].values
+    for pos, calc_ in calc_map.items():
+        mask = ppos==pos
+        coef[mask] = calc_['coef_imp'][xvars].values
+        icpt[mask] = calc_['coef_imp']['Intercept']
+
+    # accumulate in column order so rounding matches predict_povr
+    pred_raw = np.zeros((n_scn, n_ply))
+    for i, var in enumerate(xvars):
+        pred_raw = pred_raw + stack[:,:,cols_attr.index(var)]*coef[:,i]
+    pred = np.clip((pred_raw + icpt).round(0), 0, 99)
+
+    return np.where(np.isnan(icpt), sp['povr'].values.astype('float64'), pred)
+
+
+def get_depth_stack(play, povr, stack, cols_attr):
+    '''
+    get depth order within team/position for stacked scenarios (highest POVR; ties by PAWR, PSPD)
+
+    - depth: 0-based order among rostered players at position (-1 for free agents)
+    - ddep: depth chart slot used for PIMP (0 for players off the chart, kickers/punters and free agents)
+    '''
+
+    sp = play
+    n_scn, n_ply = povr.shape
+    ddep_max = get_ddep_max()
+    tgid = sp['tgid'].values
+    ppos = sp['ppos'].values
+    rostered = np.isin(tgid, range(1,33)) & np.isin(ppos, range(0,21))
+
+    # sort all scenarios at once: scenario, team, position, then ratings (descending)
+    scn = np.repeat(np.arange(n_scn), rostered.sum())
+    cols = [np.tile(v[rostered], n_scn) for v in [tgid, ppos]]
+    pawr = stack[:, rostered, cols_attr.index('pawr')].ravel()
+    pspd = stack[:, rostered, cols_attr.index('pspd')].ravel()
+    order = np.lexsort((-pspd, -pawr, -povr[:, rostered].ravel(), cols[1], cols[0], scn))
+
+    # rank within scenario/team/position groups
+    keys = np.stack([scn[order], cols[0][order], cols[1][order]])
+    new_grp = np.concatenate([[True], (keys[:,1:] != keys[:,:-1]).any(axis=0)])
+    pos_ = np.arange(order.shape[0])
+    rank_sorted = pos_ - np.maximum.accumulate(np.where(new_grp, pos_, 0))
+    rank = np.empty_like(rank_sorted)
+    rank[order] = rank_sorted
+
+    depth = np.full((n_scn, n_ply), -1, dtype='int64')
+    depth[:, rostered] = rank.reshape(n_scn, -1)
+
+    max_ = np.array([ddep_max[p] for p in ppos])
+    on_chart = rostered & (ppos < 19)
+    ddep = np.where(on_chart[None,:] & (depth < max_[None,:]), depth, 0)
+
+    return depth, ddep
+
+
+def predict_pimp_stack(play, povr, ddep, calc_map):
+    '''
+    get PIMP predictions for stacked scenarios
+    '''
+
+    ppos_coef = play['ppos'].map(calc_map['ppos']).values.astype('float64')
+    pred_raw = calc_map['Intercept'] + calc_map['povr']*povr + calc_map['ddep']*ddep + ppos_coef
+
+    return np.clip(pred_raw.round(0), 0, 99)
+
+
+def run_scenarios(play, ddplay, povr_calc, pimp_calc, scenarios, chunk=64):
+    '''
+    evaluate ratings scenarios on PLAY table; returns POVR, depth order and PIMP by scenario and player
+
+    - scenarios are processed in chunks to bound memory (chunk x players x attributes)
+    '''
+
+    sp = play.reset_index(drop=True)
+    cols_attr = get_attr_cols(ddplay)
+    names = [scn.get('name', f"scenario_{i}") for i, scn in enumerate(scenarios)]
+    masks = get_query_masks(sp, scenarios)
+
+    out = []
+    for start in range(0, len(scenarios), chunk):
+        scn_ = scenarios[start:start+chunk]
+        stack = stack_scenarios(sp, scn_, cols_attr, masks)
+        povr = predict_povr_stack(sp, stack, cols_attr, povr_calc)
+        depth, ddep = get_depth_stack(sp, povr, stack, cols_attr)
+        pimp = predict_pimp_stack(sp, povr, ddep, pimp_calc)
+
+        n_scn = len(scn_)
+        out.append(pd.DataFrame({
+            'scenario': np.repeat(names[start:start+chunk], sp.shape[0]),
+            'pgid': np.tile(sp['pgid'].values, n_scn),
+            'tgid': np.tile(sp['tgid'].values, n_scn),
+            'ppos': np.tile(sp['ppos'].values, n_scn),
+            'povr': povr.ravel().astype('int64'),
+            'depth': depth.ravel(),
+            'ddep': ddep.ravel(),
+            'pimp': pimp.ravel().astype('int64')
+        }))
+
+    return pd.concat(out, axis=0, ignore_index=True)
+
+
+def summarize_scenarios(results, play):
+    '''
+    summarize scenario results vs. current PLAY table (POVR/PIMP changes, new starters)
+    '''
+
+    sp = play[['pgid','povr','pimp']].rename(columns={'povr':'povr_curr','pimp':'pimp_curr'})
+    res = results.merge(sp, on='pgid', how='left')
+    res['povr_diff'] = res['povr'] - res['povr_curr']
+    res['starter'] = res['depth']==0
+
+    # starters in first scenario are used as reference
+    ref = res.loc[res['scenario']==res['scenario'].iloc[0], ['pgid','starter']].rename(columns={'starter':'starter_ref'})
+    res = res.merge(ref, on='pgid', how='left')
+
+    out = res.groupby('scenario', sort=False).agg(
+        povr_changed=('povr_diff', lambda x: int((x!=0).sum())),
+        povr_diff_mean=('povr_diff', 'mean'),
+        pimp_changed=('pimp', lambda x: int((x != res.loc[x.index, 'pimp_curr']).sum())),
+        starters_changed=('starter', lambda x: int((x != res.loc[x.index, 'starter_ref']).sum()))
+    ).reset_index()
+
+    return out
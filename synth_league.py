@@ -0,0 +1,203 @@
+"""
+Synthetic league generator for benchmarking
+
+- resamples players from an imported save at a configurable scale, jitters attributes and
+  clips all numeric columns to data dict ranges
+- team rosters keep their imported sizes (jersey numbers and depth charts are bounded per team);
+  additional players are free agents, so rostered work scales with the number of leagues (make_synth_leagues)
+- writes PLAY/TEAM/DCHT/INJY save tables plus matching update files (MISS, CAPS, DROP, RATE, TXS)
+- note: player ids are sequential and can exceed the game's PGID range at large scales
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from save_updater import load_saves, load_calcs
+from save_tools import get_ppos_maps, get_tgid_maps, predict_povr_vec, get_column_ranges, update_dcht
+
+
+def sample_players(play, ddplay, n, rng, calc_map, jitter=3, pgid_start=1):
+    '''
+    resample n players from PLAY table with attribute jitter and recalculated POVR
+    '''
+
+    sp = play.copy()
+    dp = ddplay.copy()
+    ranges = get_column_ranges(dp)
+
+    out = sp.iloc[rng.integers(0, sp.shape[0], n)].reset_index(drop=True)
+
+    # new ids and names (first/last names resampled independently)
+    out['pgid'] = np.arange(pgid_start, pgid_start+n)
+    out['poid'] = out['pgid']
+    out['pfna'] = sp['pfna'].values[rng.integers(0, sp.shape[0], n)]
+    out['plna'] = sp['plna'].values[rng.integers(0, sp.shape[0], n)]
+
+    # jitter attributes
+    cols_attr = [c for c in dp.loc[dp['category']=='Attributes', 'column'].str.lower() if c not in ['povr','pimp']]
+    out[cols_attr] = out[cols_attr] + rng.integers(-jitter, jitter+1, (n, len(cols_attr)))
+
+    # clip to data dict ranges
+    for col, (lo, hi) in ranges.items():
+        if col in out.columns and pd.api.types.is_numeric_dtype(out[col]):
+            out[col] = out[col].clip(lo, hi)
+
+    out['povr'] = predict_povr_vec(out, calc_map).fillna(out['povr']).astype('int64')
+
+    return out
+
+
+def make_updates(play, team, ddplay, rng, calc_map, frac=0.01):
+    '''
+    create update tables (MISS, CAPS, DROP, RATE, TXS) matching synthetic PLAY table
+    '''
+
+    sp = play.copy()
+    st = team.copy()
+    dp = ddplay.copy()
+    ppos_map = get_ppos_maps()[0]
+    tgid_map = get_tgid_maps(st)[0]
+    n = max(2, int(sp.shape[0]*frac))
+    rostered = sp.loc[sp['tgid'].isin(range(1,33))]
+    fa = sp.loc[sp['tgid']==1009]
+
+    # missing bios: rename rostered players
+    miss = rostered.sample(n, random_state=rng).drop_duplicates(['tgid','pfna','plna'])
+    miss = pd.DataFrame({
+        'tsna': [tgid_map[i] for i in miss['tgid']],
+        'pfna': miss['pfna'].values,
+        'plna': miss['plna'].values,
+        'pfna_upd': sp['pfna'].sample(miss.shape[0], random_state=rng).values,
+        'plna_upd': sp['plna'].sample(miss.shape[0], random_state=rng).values,
+        'pjen_upd': miss['pjen'].values
+    })
+
+    # caps: new players with ids above current max
+    caps = sample_players(sp, dp, n, rng, calc_map, pgid_start=sp['pgid'].max()+1)
+    caps['tgid'] = rng.integers(1, 33, n)
+    caps['ppti'] = 1023
+
+    # drops: remove existing players
+    drop = sp.sample(n, random_state=rng)[['pgid','pfna','plna','ppos']]
+    drop['pos'] = [ppos_map[i] for i in drop['ppos']]
+
+    # ratings: new attribute values for subset of players (missing values are not updated)
+    cols_attr = list(dp.loc[dp['category']=='Attributes', 'column'].str.lower())
+    rate_ = sp.sample(n, random_state=rng)
+    rate = rate_[['pgid','pfna','plna']].copy()
+    rate['pos'] = [ppos_map[i] for i in rate_['ppos']]
+    vals = (rate_[cols_attr].values + rng.integers(-5, 6, (n, len(cols_attr)))).clip(0, 99).astype('float64')
+    vals[rng.random(vals.shape) < 0.5] = np.nan
+    rate[cols_attr] = vals
+
+    # transactions: release/trade rostered players, sign free agents (one tx per player)
+    n_fa = min(n//2, fa.shape[0])
+    tx_tm = rostered.loc[~rostered['pgid'].isin(drop['pgid'])].sample(n-n_fa, random_state=rng)
+    tx_fa = fa.loc[~fa['pgid'].isin(drop['pgid'])].sample(n_fa, random_state=rng)
+    tx_type = np.where(rng.random(tx_tm.shape[0]) < 0.5, 'release', 'trade')
+    tgid_to = np.where(tx_type=='release', 1009, (tx_tm['tgid'].values + rng.integers(1, 32, tx_tm.shape[0]) - 1) % 32 + 1)
+    txss = pd.DataFrame({
+        'pgid': np.append(tx_tm['pgid'].values, tx_fa['pgid'].values),
+        'pfna': np.append(tx_tm['pfna'].values, tx_fa['pfna'].values),
+        'plna': np.append(tx_tm['plna'].values, tx_fa['plna'].values),
+        'tx': np.append(tx_type, np.repeat('sign', n_fa)),
+        'tgid_fr': np.append(tx_tm['tgid'].values, np.repeat(1009, n_fa)),
+        'tgid_to': np.append(tgid_to, rng.integers(1, 33, n_fa))
+    })
+    txss.insert(0, 'txid', np.arange(txss.shape[0]))
+    txss.insert(1, 'date', pd.Timestamp('2004-08-01') - pd.to_timedelta(rng.integers(0, 180, txss.shape[0]), unit='D'))
+    txss['date'] = txss['date'].dt.strftime('%Y-%m-%d')
+    txss['tsna_fr'] = [tgid_map.get(i, 'FA') for i in txss['tgid_fr']]
+    txss['tsna_to'] = [tgid_map.get(i, 'FA') for i in txss['tgid_to']]
+    txss.sort_values(['date','txid'], inplace=True)
+
+    return {'miss': miss, 'caps': caps, 'drop': drop, 'rate': rate, 'txss': txss}
+
+
+def write_table(data, ddata, path):
+    '''
+    write table using data dict column names and order
+    '''
+
+    cols = list(ddata.sort_values('view_id')['column'].values)
+    out = data[[c.lower() for c in cols]].copy()
+    out.columns = cols
+    out.to_csv(path, index=0, header=True)
+
+
+def get_synth_overlay(config, name):
+    '''
+    get config overlay for synthetic save and update files
+    '''
+
+    files = {'miss': 'PLAY_MISS_UPD.csv', 'caps': 'PLAY_CAPS_UPD.csv', 'drop': 'PLAY_DROP_UPD.csv',
+             'rate': 'PLAY_RATE_UPD.csv', 'txss': 'PLAY_TXS_UPD.csv'}
+    overlay = {
+        'saves': {'import': name, 'export': f"{name}_UPDATED"},
+        'updates': dict({'dir': f"{config['updates']['dir']}/{name}"}, **files)
+    }
+
+    return overlay
+
+
+def make_synth_save(config, name='SYNTH', scale=10, seed=0, jitter=3, upd_frac=0.01):
+    '''
+    generate synthetic save and update files; returns config overlay for the generated data
+    '''
+
+    rng = np.random.default_rng(seed)
+    saves = load_saves(config)
+    calcs = load_calcs(config)
+    sp, dp = saves['play']['sv'], saves['play']['dd']
+    st = saves['team']['sv']
+
+    # PLAY: resample base players at scale; TEAM: copied; DCHT: rebuilt; INJY: resampled injuries
+    play = sample_players(sp, dp, int(round(sp.shape[0]*scale)), rng, calcs['povr_calc'], jitter=jitter)
+    roster_size = sp.loc[sp['tgid'].isin(range(1,33))].groupby('tgid').size()
+    rostered = play['tgid'].isin(range(1,33))
+    over = rostered & (play.groupby('tgid').cumcount() >= play['tgid'].map(roster_size).fillna(0))
+    play.loc[over, 'ppti'] = play.loc[over, 'tgid']
+    play.loc[over, 'tgid'] = 1009
+    # free agents (incl. moved overflow players) without contracts, as for released players
+    play.loc[play['tgid']==1009, ['ptsa','pvts','psbo','pvsb','pcon','pvco','pcyl']] = 0
+    play.sort_values(['tgid','ppos','pgid'], inplace=True)
+    team = st.copy()
+    dcht = update_dcht(play)
+    injy_ = saves['injy']['sv']
+    n_injy = min(int(round(injy_.shape[0]*scale)), int(play['tgid'].isin(range(1,33)).sum()))
+    injy = injy_.iloc[rng.integers(0, max(1, injy_.shape[0]), n_injy)].reset_index(drop=True) if injy_.shape[0]>0 else injy_.copy()
+    inj_players = play.loc[play['tgid'].isin(range(1,33))].sample(n_injy, random_state=rng)
+    injy['pgid'] = inj_players['pgid'].values
+    injy['tgid'] = inj_players['tgid'].values
+
+    # write save tables
+    save_dir = f"{config['saves']['dir']}/{name}"
+    os.makedirs(save_dir, exist_ok=True)
+    for key, data in {'play': play, 'team': team, 'dcht': dcht, 'injy': injy}.items():
+        write_table(data, saves[key]['dd'], f"{save_dir}/{name}_{key.upper()}.csv")
+
+    # write update files
+    upd = make_updates(play, team, dp, rng, calcs['povr_calc'], frac=upd_frac)
+    overlay = get_synth_overlay(config, name)
+    upd_dir = overlay['updates']['dir']
+    os.makedirs(upd_dir, exist_ok=True)
+    write_table(upd['caps'], dp, f"{upd_dir}/{overlay['updates']['caps']}")
+    for key in ['miss','drop','rate','txss']:
+        out = upd[key].copy()
+        out.columns = [c.upper() if key!='txss' else c for c in out.columns]
+        out.to_csv(f"{upd_dir}/{overlay['updates'][key]}", index=0, header=True)
+
+    return overlay
+
+
+def make_synth_leagues(config, name='SYNTH', scale=1, leagues=2, seed=0, **kwargs):
+    '''
+    generate multiple synthetic leagues (one save each); returns config overlays (e.g. for run_batch)
+    '''
+
+    overlays = []
+    for i in range(leagues):
+        overlays.append(make_synth_save(config, name=f"{name}_L{i:02d}", scale=scale, seed=seed+i, **kwargs))
+
+    return overlays
@@ -0,0 +1,39 @@
+import os
+import sys
+import tracemalloc
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrument import instrument_stage
+
+
+class StageSave():
+
+    def __init__(self):
+        self.instrument = True
+        self.stage_log = []
+        self.stage_callbacks = []
+        self.sv_play = pd.DataFrame({'pgid': [1, 2], 'povr': [60, 70]})
+
+    @instrument_stage('ratings')
+    def update_ratings(self, write=False):
+        out = self.sv_play.assign(povr=self.sv_play['povr'] + 1)
+        if write:
+            self.sv_play = out
+        return out
+
+
+def test_stage_memory_without_reset_peak(monkeypatch):
+    # Python 3.8 has no tracemalloc.reset_peak
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+    save = StageSave()
+    tracemalloc.start()
+    try:
+        save.update_ratings(write=True)
+    finally:
+        tracemalloc.stop()
+
+    rec = save.stage_log[0]
+    assert rec['mem_delta_mb'] is not None and rec['mem_peak_mb'] is not None
+    assert rec['rows_changed'] == 2
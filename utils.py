@@ -73,3 +73,82 @@ def is_unique(data, cols, print_dups=True, return_dups=False):
             return bad
         return False
     return True
+
+
+def merge_config(base, overlay):
+    '''
+    recursively merge config overlay into base config (overlay values take precedence)
+    '''
+
+    out = dict(base)
+    for k, v in overlay.items():
+        if isinstance(v, dict) and isinstance(out.get(k), dict):
+            out[k] = merge_config(out[k], v)
+        else:
+            out[k] = v
+
+    return out
+
+
+def get_sort_keys(data, cols):
+    '''
+    get sort key columns as structured array (float; missing values sort last)
+    '''
+
+    keys = np.empty(data.shape[0], dtype=[(c, 'float64') for c in cols])
+    for col in cols:
+        keys[col] = data[col].values.astype('float64')
+
+    return keys
+
+
+def is_sorted(data, cols):
+    '''
+    check if data frame rows are sorted by columns (ascending, missing last) in one pass
+    '''
+
+    if data.shape[0] < 2:
+        return True
+    if not all(pd.api.types.is_numeric_dtype(data[c]) for c in cols):
+        return False
+
+    eq = np.ones(data.shape[0]-1, dtype=bool)
+    for col in cols:
+        v = data[col].values.astype('float64')
+        v = np.where(np.isnan(v), np.inf, v)
+        if (eq & (v[:-1] > v[1:])).any():
+            return False
+        eq &= v[:-1] == v[1:]
+
+    return True
+
+
+def sort_table(data, cols):
+    '''
+    sort data frame by columns, skipping the sort if rows are already in order; returns copy
+    '''
+
+    return data.copy() if is_sorted(data, cols) else data.sort_values(cols, kind='stable')
+
+
+def merge_sorted(data, batch, cols):
+    '''
+    merge batch rows into data frame sorted by columns
+
+    - batch is sorted and inserted by binary search (O(n + k log n)); equal keys keep data rows first
+    - falls back to a full sort if data is not in order
+    '''
+
+    if not is_sorted(data, cols):
+        return sort_table(pd.concat([data, batch], axis=0), cols)
+
+    b = sort_table(batch, cols)
+    n, k = data.shape[0], b.shape[0]
+    pos = np.searchsorted(get_sort_keys(data, cols), get_sort_keys(b, cols), side='right') + np.arange(k)
+    order = np.empty(n+k, dtype='int64')
+    is_batch = np.zeros(n+k, dtype=bool)
+    is_batch[pos] = True
+    order[is_batch] = n + np.arange(k)
+    order[~is_batch] = np.arange(n)
+
+    return pd.concat([data, b], axis=0).iloc[order]